@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+
+# Contadores de invalidación repartidos por hash de clave: memoria fija aunque se
+# invaliden millones de claves; una colisión solo hace que se omita algún set()
+GENERATION_SLOTS = 4096
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._generations = [0] * GENERATION_SLOTS
+
+    def _slot(self, key: Hashable) -> int:
+        return hash(key) % GENERATION_SLOTS
+
+    def generation(self, key: Hashable) -> Tuple[int, int]:
+        # Se lee antes de ir a la base de datos y se pasa a set(): si la clave se invalidó
+        # mientras la consulta estaba en curso, el valor leído puede ser anterior al cambio
+        with self._lock:
+            return self._epoch, self._generations[self._slot(key)]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[Tuple[int, int]] = None):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations[self._slot(key)]):
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._generations[self._slot(key)] += 1
+
+    def delete_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+            # El predicado no alcanza a las claves que se están cargando: se invalidan todas
+            self._epoch += 1
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._epoch += 1
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+cache = LRUCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL, enabled=CACHE_ENABLED)
@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from typing import Callable, Iterable, List, Tuple
+from sqlalchemy import create_engine, event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from app.cache import cache
+from app.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CACHE_BUS_CHANNEL = os.getenv("CACHE_BUS_CHANNEL", "biblioteca_cache")
+# NOTIFY admite payloads de hasta 8000 bytes
+NOTIFY_MAX_PAYLOAD = 7500
+PENDING_KEY = "cache_invalidations"
+
+CacheKey = Tuple[str, object]
+
+
+class InMemoryBus:
+    def __init__(self):
+        self._subscribers: List[Callable[[List[CacheKey]], None]] = []
+
+    def subscribe(self, callback: Callable[[List[CacheKey]], None]):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[List[CacheKey]], None]):
+        self._subscribers.remove(callback)
+
+    def publish(self, db: Session, keys: Iterable[CacheKey]):
+        # Se entrega al confirmar la transacción; si hay rollback se descarta
+        db.info.setdefault(PENDING_KEY, []).extend(keys)
+
+    def deliver(self, keys: List[CacheKey]):
+        for callback in self._subscribers:
+            callback(keys)
+
+    def send(self, keys: List[CacheKey]):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class PostgresBus(InMemoryBus):
+    def __init__(self, url: str, channel: str = CACHE_BUS_CHANNEL):
+        super().__init__()
+        self.channel = channel
+        self._engine = create_engine(url, poolclass=NullPool)
+        self._stop = threading.Event()
+        self._thread = None
+        self._outbox = queue.Queue()
+        self._publisher = None
+
+    def send(self, keys: List[CacheKey]):
+        # Tras el COMMIT y fuera de la sesión de la petición: la escritura no paga un
+        # pg_notify extra; el hilo publicador agrupa las claves pendientes
+        if self._publisher is not None:
+            self._outbox.put(keys)
+        else:
+            self._notify(keys)
+
+    def _notify(self, keys: List[CacheKey]):
+        with self._engine.connect() as conn:
+            for payload in _chunk_payloads(keys):
+                conn.execute(sql_select(func.pg_notify(self.channel, payload)))
+            conn.commit()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="cache-bus", daemon=True)
+        self._thread.start()
+        self._publisher = threading.Thread(target=self._publish, name="cache-bus-publisher", daemon=True)
+        self._publisher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._publisher is not None:
+            self._outbox.put(None)
+            self._publisher.join(timeout=5)
+            self._publisher = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _publish(self):
+        while True:
+            keys = self._outbox.get()
+            if keys is None:
+                return
+            # Todo lo que se acumuló mientras se enviaba el lote anterior sale junto
+            stop = False
+            while True:
+                try:
+                    more = self._outbox.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                keys = keys + more
+            try:
+                self._notify(list(dict.fromkeys(keys)))
+            except Exception:
+                # Las demás cachés se quedan con entradas obsoletas hasta su TTL
+                logger.exception("No se pudo publicar la invalidación de caché")
+            if stop:
+                return
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                connection = self._engine.raw_connection()
+            except Exception:
+                logger.exception("No se pudo conectar el bus de invalidación")
+                self._stop.wait(1)
+                continue
+            try:
+                listener = connection.driver_connection
+                listener.autocommit = True
+                listener.cursor().execute(f'LISTEN "{self.channel}"')
+                # Durante la desconexión pudieron perderse mensajes
+                cache.clear()
+                while not self._stop.is_set():
+                    if select.select([listener], [], [], 1.0) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        notify = listener.notifies.pop(0)
+                        self.deliver([tuple(key) for key in json.loads(notify.payload)])
+            except Exception:
+                logger.exception("Se perdió la conexión del bus de invalidación")
+                self._stop.wait(1)
+            finally:
+                connection.close()
+
+
+def _chunk_payloads(keys: List[CacheKey]):
+    chunk = []
+    size = 2
+    for key in keys:
+        encoded = json.dumps(list(key))
+        if chunk and size + len(encoded) + 1 > NOTIFY_MAX_PAYLOAD:
+            yield "[" + ",".join(chunk) + "]"
+            chunk = []
+            size = 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        yield "[" + ",".join(chunk) + "]"
+
+
+def create_bus() -> InMemoryBus:
+    backend = os.getenv("CACHE_BUS")
+    if backend is None:
+        backend = "postgres" if DATABASE_URL.startswith("postgresql") else "memory"
+    if backend == "postgres":
+        return PostgresBus(DATABASE_URL)
+    return InMemoryBus()
+
+
+def invalidate_cache(keys: List[CacheKey]):
+    cache.delete(*keys)
+    # Los libros en caché incluyen a su autor: se descartan junto con él
+    autor_ids = {key[1] for key in keys if key[0] == "autor"}
+    if autor_ids:
+        cache.delete_where(lambda key, value: key[0] == "libro" and value.autor_id in autor_ids)
+
+
+bus = create_bus()
+bus.subscribe(invalidate_cache)
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_after_commit(session: Session):
+    keys = session.info.pop(PENDING_KEY, None)
+    if keys:
+        bus.deliver(keys)
+        bus.send(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session):
+    session.info.pop(PENDING_KEY, None)
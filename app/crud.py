@@ -1,28 +1,328 @@
-from typing import List, Optional
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import Session, joinedload
+import json
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+from sqlalchemy import Double, Row, any_, bindparam, cast, delete, func, insert, inspect, literal_column, select, table, text, union, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, contains_eager, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from app import models, schemas
+from app.cache import cache
+from app.cache_bus import bus
+from app.pagination import decode_cursor, encode_cursor, keyset_condition
+
+# Orden estable para paginar por cursor: (columna, descendente)
+LIBRO_SORT_KEYS = [(models.Libro.id, False)]
+
+# Órdenes de /libros; los de año terminan en id para ser estables y coinciden con los
+# índices (autor_id, ano_publicacion, id) y (ano_publicacion, id)
+LIBRO_SORTS = {
+    schemas.LibroSort.id: LIBRO_SORT_KEYS,
+    schemas.LibroSort.id_desc: [(models.Libro.id, True)],
+    schemas.LibroSort.ano_publicacion: [(models.Libro.ano_publicacion, False), (models.Libro.id, False)],
+    schemas.LibroSort.ano_publicacion_desc: [(models.Libro.ano_publicacion, True), (models.Libro.id, True)],
+}
+
+# Columnas que necesita LibroResponse; los listados devuelven filas, no objetos del ORM
+LIBRO_ROW_COLUMNS = (
+    models.Libro.titulo,
+    models.Libro.isbn,
+    models.Libro.ano_publicacion,
+    models.Libro.autor_id,
+    models.Libro.id,
+    models.Libro.created_at,
+    models.Autor.nombre.label("autor_nombre"),
+    models.Autor.created_at.label("autor_created_at")
+)
+
+# Campos de LibroResponse que admite ?fields= y las columnas que necesita cada uno
+LIBRO_FIELDS = tuple(schemas.LibroResponse.model_fields)
+LIBRO_FIELD_COLUMNS = {
+    field: (getattr(models.Libro, field),) for field in LIBRO_FIELDS if field != "autor"
+}
+LIBRO_FIELD_COLUMNS["autor"] = (models.Libro.autor_id,) + LIBRO_ROW_COLUMNS[-2:]
+
+# Filas por lote en la carga masiva: una consulta de autores, una de ISBN y un INSERT
+BULK_CHUNK_SIZE = 1000
+
+# Filas por lote al exportar con cursor del lado del servidor
+EXPORT_BATCH_SIZE = 1000
+
+# El tokenizador trigram de FTS5 necesita al menos 3 caracteres por término
+FTS_MIN_TERM_LENGTH = 3
+
+
+class LibroPage(NamedTuple):
+    items: List[Row]
+    total: Optional[int]
+    has_more: bool
+    next_cursor: Optional[str]
+
+
+class BulkResult(NamedTuple):
+    inserted: int
+    errors: List[Tuple[int, str]]
+
+
+def _dialect_name(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _explain_sql(statement, dialect) -> Tuple[str, Union[tuple, dict]]:
+    # render_postcompile expande los IN (autor_id repetido) en un parámetro por valor
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    return f"EXPLAIN (FORMAT JSON) {compiled}", params
+
+
+def _explain_rows(db: Session, statement) -> int:
+    connection = db.connection()
+    sql, params = _explain_sql(statement, connection.dialect)
+    plan = connection.exec_driver_sql(sql, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _count_statement(stmt):
+    return stmt.with_only_columns(func.count(models.Libro.id))
+
+
+def _row_columns(fields: Optional[Sequence[str]] = None) -> list:
+    if fields is None:
+        return list(LIBRO_ROW_COLUMNS)
+    columns = {}
+    for field in fields:
+        if field not in LIBRO_FIELD_COLUMNS:
+            raise ValueError(f"Campo desconocido: {field}")
+        for column in LIBRO_FIELD_COLUMNS[field]:
+            columns[column.key] = column
+    return list(columns.values())
+
+
+def _needs_autor(fields: Optional[Sequence[str]]) -> bool:
+    return fields is None or "autor" in fields
+
+
+def _joins_autor(stmt) -> bool:
+    return any(
+        from_.is_derived_from(models.Autor.__table__) for from_ in stmt.get_final_froms()
+    )
+
+
+def estimate_count(db: Session, stmt, filtered: bool = True) -> int:
+    # Estadísticas del planificador de PostgreSQL; en otros motores se cuenta exacto
+    if _dialect_name(db) != "postgresql":
+        return db.scalar(_count_statement(stmt))
+    
+    if not filtered:
+        reltuples = db.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = CAST(:tabla AS regclass)"),
+            {"tabla": models.Libro.__tablename__}
+        ).scalar()
+        # reltuples es -1 mientras la tabla no se haya analizado
+        if reltuples is not None and reltuples >= 0:
+            return int(reltuples)
+    
+    return _explain_rows(db, stmt.with_only_columns(models.Libro.id))
+
+
+def _fetch_page(
+    db: Session,
+    stmt,
+    sort_keys,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.exact,
+    filtered: bool = True,
+    fields: Optional[Sequence[str]] = None
+) -> LibroPage:
+    # stmt es un select() de Core con los FROM/WHERE del listado; las columnas se eligen aquí
+    count_stmt = _count_statement(stmt)
+    
+    columns = _row_columns(fields)
+    key_columns = slice(len(columns), len(columns) + len(sort_keys))
+    columns += [column.label(f"orden_{i}") for i, (column, _) in enumerate(sort_keys)]
+    if count == schemas.CountStrategy.exact:
+        # El total viaja como subconsulta escalar en la misma consulta de la página
+        columns.append(count_stmt.correlate(None).scalar_subquery().label("total"))
+    
+    query = stmt.with_only_columns(*columns)
+    # Sin campos del autor no hace falta el join con autores
+    if _needs_autor(fields) and not _joins_autor(stmt):
+        query = query.join(models.Autor, models.Libro.autor_id == models.Autor.id)
+    query = query.order_by(
+        *[column.desc() if desc else column.asc() for column, desc in sort_keys]
+    )
+    
+    if cursor:
+        values = decode_cursor(cursor, len(sort_keys))
+        query = query.where(keyset_condition(sort_keys, values))
+    else:
+        query = query.offset(skip)
+    
+    # Se pide una fila extra para saber si hay más páginas sin contar
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    total = None
+    if count == schemas.CountStrategy.exact:
+        if rows:
+            total = rows[0].total
+        elif skip or cursor:
+            total = db.scalar(count_stmt)
+        else:
+            total = 0
+    elif count == schemas.CountStrategy.estimated:
+        total = estimate_count(db, stmt, filtered)
+    
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(list(rows[-1][key_columns]))
+    return LibroPage(
+        items=rows,
+        total=total,
+        has_more=has_more,
+        next_cursor=next_cursor
+    )
+
+
+def _fts_match_expression(titulo: Optional[str], autor: Optional[str]) -> Optional[str]:
+    terms = [(column, term) for column, term in (("titulo", titulo), ("autor", autor)) if term]
+    if any(len(term) < FTS_MIN_TERM_LENGTH for _, term in terms):
+        return None
+    return " OR ".join(
+        '{} : "{}"'.format(column, term.replace('"', '""')) for column, term in terms
+    )
 
 
 def _build_search_query(db: Session, titulo: Optional[str] = None, autor: Optional[str] = None):
-    query = db.query(models.Libro)
-    conditions = []
+    query = select(models.Libro.id)
+    dialect = _dialect_name(db)
+    
+    match = _fts_match_expression(titulo, autor) if dialect == "sqlite" else None
+    if match:
+        libros_fts = table("libros_fts")
+        fts = (
+            select(
+                literal_column("rowid").label("libro_id"),
+                (-func.bm25(literal_column("libros_fts"))).label("rank")
+            )
+            .select_from(libros_fts)
+            .where(literal_column("libros_fts").match(match))
+            .subquery("fts")
+        )
+        query = query.join(fts, fts.c.libro_id == models.Libro.id)
+        return query, [(fts.c.rank, True)] + LIBRO_SORT_KEYS
+    
+    ranks = []
     
     if titulo:
-        conditions.append(models.Libro.titulo.ilike(f"%{titulo}%"))
+        ranks.append(func.word_similarity(titulo, models.Libro.titulo))
     
     if autor:
-        conditions.append(models.Autor.nombre.ilike(f"%{autor}%"))
-        query = query.join(models.Autor)
+        ranks.append(func.word_similarity(autor, models.Autor.nombre))
+        query = query.join(models.Autor, models.Libro.autor_id == models.Autor.id)
     
-    if conditions:
-        query = query.filter(or_(*conditions))
+    if titulo and autor:
+        # Un OR entre columnas de dos tablas no puede usar ninguno de los índices trigram:
+        # cada lado del UNION filtra una sola tabla y usa el suyo
+        por_titulo = select(models.Libro.id).where(models.Libro.titulo.ilike(f"%{titulo}%"))
+        por_autor = (
+            select(models.Libro.id)
+            .join(models.Autor, models.Libro.autor_id == models.Autor.id)
+            .where(models.Autor.nombre.ilike(f"%{autor}%"))
+        )
+        query = query.where(models.Libro.id.in_(union(por_titulo, por_autor)))
+    elif titulo:
+        query = query.where(models.Libro.titulo.ilike(f"%{titulo}%"))
+    elif autor:
+        query = query.where(models.Autor.nombre.ilike(f"%{autor}%"))
     
-    return query
+    if dialect == "postgresql" and ranks:
+        rank = ranks[0] if len(ranks) == 1 else func.greatest(*ranks)
+        # word_similarity devuelve real; en double precision el valor del cursor compara exacto
+        rank = cast(rank, Double)
+        return query, [(rank, True)] + LIBRO_SORT_KEYS
+    
+    return query, LIBRO_SORT_KEYS
+
+
+def _detached_copy(obj):
+    mapper = inspect(obj).mapper
+    copy = mapper.class_(**{attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+
+def _cache_libro(libro: models.Libro, generation: Tuple[int, int]):
+    copy = _detached_copy(libro)
+    set_committed_value(copy, "autor", _detached_copy(libro.autor))
+    cache.set(("libro", libro.id), copy, generation)
+
+
+def _from_cache(db: Session, model, pk: int, cached):
+    # Si la sesión ya tiene la fila se usa esa; si no, merge sin ir a la base de datos
+    existing = db.identity_map.get(db.identity_key(model, pk))
+    if existing is not None:
+        return existing
+    return db.merge(cached, load=False)
+
+
+def _invalidate_libro(db: Session, libro_id: int, *isbns: str):
+    # Se registra antes del COMMIT; el bus invalida las cachés de todos los workers al confirmar.
+    # Los INSERT no invalidan nada: get_libro_by_isbn no guarda ISBN inexistentes y descarta
+    # las entradas cuyo libro ya no tiene ese ISBN
+    bus.publish(db, [("isbn", isbn) for isbn in isbns] + [("libro", libro_id)])
 
 
 def get_autor(db: Session, autor_id: int) -> Optional[models.Autor]:
-    return db.query(models.Autor).filter(models.Autor.id == autor_id).first()
+    cached = cache.get(("autor", autor_id))
+    if cached is not None:
+        return _from_cache(db, models.Autor, autor_id, cached)
+    
+    generation = cache.generation(("autor", autor_id))
+    autor = db.query(models.Autor).filter(models.Autor.id == autor_id).first()
+    if autor:
+        cache.set(("autor", autor_id), _detached_copy(autor), generation)
+    return autor
+
+
+def delete_autor(db: Session, autor_id: int) -> Optional[int]:
+    if _dialect_name(db) == "postgresql":
+        # La CTE ve los libros antes del borrado: el conteo y el DELETE son una sola sentencia
+        borrado = (
+            delete(models.Autor)
+            .where(models.Autor.id == autor_id)
+            .returning(models.Autor.id)
+            .cte("autor_borrado")
+        )
+        row = db.execute(
+            select(
+                borrado.c.id,
+                select(func.count(models.Libro.id))
+                .where(models.Libro.autor_id == borrado.c.id)
+                .scalar_subquery()
+            )
+        ).first()
+    else:
+        libros = db.scalar(select(func.count(models.Libro.id)).where(models.Libro.autor_id == autor_id))
+        borrado = db.scalar(delete(models.Autor).where(models.Autor.id == autor_id).returning(models.Autor.id))
+        row = None if borrado is None else (borrado, libros)
+    
+    if row is None:
+        db.rollback()
+        return None
+    
+    # ON DELETE CASCADE borra los libros en la base de datos; la caché se purga por autor
+    bus.publish(db, [("autor", autor_id)])
+    db.commit()
+    return row[1]
 
 
 def get_autor_by_nombre(db: Session, nombre: str) -> Optional[models.Autor]:
@@ -37,7 +337,7 @@ def create_autor(db: Session, autor: schemas.AutorCreate) -> models.Autor:
     return db_autor
 
 
-def get_libro(db: Session, libro_id: int) -> Optional[models.Libro]:
+def _load_libro(db: Session, libro_id: int) -> Optional[models.Libro]:
     return (
         db.query(models.Libro)
         .options(joinedload(models.Libro.autor))
@@ -46,42 +346,203 @@ def get_libro(db: Session, libro_id: int) -> Optional[models.Libro]:
     )
 
 
+def get_libro(db: Session, libro_id: int) -> Optional[models.Libro]:
+    cached = cache.get(("libro", libro_id))
+    if cached is not None:
+        return _from_cache(db, models.Libro, libro_id, cached)
+    
+    # Una actualización que confirme durante la carga invalida esta generación
+    generation = cache.generation(("libro", libro_id))
+    libro = _load_libro(db, libro_id)
+    if libro:
+        _cache_libro(libro, generation)
+    return libro
+
+
+def get_libro_fields(db: Session, libro_id: int, fields: Sequence[str]) -> Optional[Row]:
+    stmt = (
+        select(*_row_columns(fields), models.Libro.version.label("libro_version"))
+        .select_from(models.Libro)
+        .where(models.Libro.id == libro_id)
+    )
+    if _needs_autor(fields):
+        stmt = stmt.join(models.Autor, models.Libro.autor_id == models.Autor.id)
+    return db.execute(stmt).first()
+
+
+def get_libros_batch(
+    db: Session,
+    ids: Optional[Sequence[int]] = None,
+    isbns: Optional[Sequence[str]] = None,
+    fields: Optional[Sequence[str]] = None
+) -> List[Optional[Row]]:
+    if ids is not None:
+        key_column, keys = models.Libro.id, list(ids)
+    else:
+        key_column = models.Libro.isbn
+        keys = [isbn.replace('-', '').replace(' ', '') for isbn in isbns]
+    if not keys:
+        return []
+    
+    unicos = list(dict.fromkeys(keys))
+    if _dialect_name(db) == "postgresql":
+        # = ANY(:claves) usa un solo parámetro de tipo array sin importar cuántas claves haya
+        condition = key_column == any_(bindparam("claves", unicos, type_=ARRAY(key_column.type)))
+    else:
+        condition = key_column.in_(unicos)
+    
+    stmt = (
+        select(*_row_columns(fields), key_column.label("clave"))
+        .select_from(models.Libro)
+        .where(condition)
+    )
+    if _needs_autor(fields):
+        stmt = stmt.join(models.Autor, models.Libro.autor_id == models.Autor.id)
+    
+    # Resultados en el orden de la petición; None marca las claves sin libro
+    encontrados = {row.clave: row for row in db.execute(stmt)}
+    return [encontrados.get(key) for key in keys]
+
+
+def get_libro_version(db: Session, libro_id: int) -> Optional[int]:
+    return db.scalar(select(models.Libro.version).where(models.Libro.id == libro_id))
+
+
 def get_libro_by_isbn(db: Session, isbn: str) -> Optional[models.Libro]:
-    return db.query(models.Libro).filter(models.Libro.isbn == isbn).first()
+    libro_id = cache.get(("isbn", isbn))
+    if libro_id is not None:
+        libro = get_libro(db, libro_id)
+        # Si el libro cambió de ISBN la entrada quedó obsoleta
+        if libro is not None and libro.isbn == isbn:
+            return libro
+        cache.delete(("isbn", isbn))
+    
+    generation = cache.generation(("isbn", isbn))
+    libro = db.query(models.Libro).filter(models.Libro.isbn == isbn).first()
+    if libro:
+        cache.set(("isbn", isbn), libro.id, generation)
+    return libro
+
+
+def _libros_statement(
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None
+):
+    stmt = select(models.Libro.id)
+    
+    if autor_id is not None:
+        autor_ids = [autor_id] if isinstance(autor_id, int) else list(dict.fromkeys(autor_id))
+        if len(autor_ids) == 1:
+            stmt = stmt.where(models.Libro.autor_id == autor_ids[0])
+        else:
+            stmt = stmt.where(models.Libro.autor_id.in_(autor_ids))
+    
+    if ano is not None:
+        stmt = stmt.where(models.Libro.ano_publicacion == ano)
+    
+    if ano_desde is not None:
+        stmt = stmt.where(models.Libro.ano_publicacion >= ano_desde)
+    
+    if ano_hasta is not None:
+        stmt = stmt.where(models.Libro.ano_publicacion <= ano_hasta)
+    
+    return stmt
+
+
+def get_libros_page(
+    db: Session,
+    skip: int = 0,
+    limit: int = 10,
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.exact,
+    fields: Optional[Sequence[str]] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None,
+    sort: schemas.LibroSort = schemas.LibroSort.id
+) -> LibroPage:
+    stmt = _libros_statement(autor_id, ano, ano_desde, ano_hasta)
+    filtered = any(value is not None for value in (autor_id, ano, ano_desde, ano_hasta))
+    return _fetch_page(db, stmt, LIBRO_SORTS[sort], skip, limit, cursor, count, filtered, fields)
 
 
 def get_libros(
     db: Session,
     skip: int = 0,
     limit: int = 10,
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    cursor: Optional[str] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None,
+    sort: schemas.LibroSort = schemas.LibroSort.id
+) -> List[Row]:
+    return get_libros_page(
+        db, skip, limit, autor_id, ano, cursor, ano_desde=ano_desde, ano_hasta=ano_hasta, sort=sort
+    ).items
+
+
+def export_libros_statement(
     autor_id: Optional[int] = None,
-    ano: Optional[int] = None
-) -> List[models.Libro]:
-    query = db.query(models.Libro).options(joinedload(models.Libro.autor))
+    ano: Optional[int] = None,
+    creado_desde: Optional[datetime] = None,
+    creado_hasta: Optional[datetime] = None
+):
+    stmt = (
+        select(
+            models.Libro.id,
+            models.Libro.titulo,
+            models.Libro.isbn,
+            models.Libro.ano_publicacion,
+            models.Libro.autor_id,
+            models.Libro.created_at,
+            models.Autor.nombre.label("autor_nombre"),
+            models.Autor.created_at.label("autor_created_at")
+        )
+        .join(models.Autor, models.Libro.autor_id == models.Autor.id)
+        .order_by(models.Libro.id)
+    )
     
     if autor_id is not None:
-        query = query.filter(models.Libro.autor_id == autor_id)
+        stmt = stmt.where(models.Libro.autor_id == autor_id)
     
     if ano is not None:
-        query = query.filter(models.Libro.ano_publicacion == ano)
+        stmt = stmt.where(models.Libro.ano_publicacion == ano)
+    
+    if creado_desde is not None:
+        stmt = stmt.where(models.Libro.created_at > creado_desde)
+    
+    if creado_hasta is not None:
+        stmt = stmt.where(models.Libro.created_at <= creado_hasta)
     
-    return query.offset(skip).limit(limit).all()
+    return stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
 
 
 def count_libros(
     db: Session,
-    autor_id: Optional[int] = None,
-    ano: Optional[int] = None
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None
 ) -> int:
-    query = db.query(models.Libro)
-    
-    if autor_id is not None:
-        query = query.filter(models.Libro.autor_id == autor_id)
-    
-    if ano is not None:
-        query = query.filter(models.Libro.ano_publicacion == ano)
-    
-    return query.count()
+    return db.scalar(_count_statement(_libros_statement(autor_id, ano, ano_desde, ano_hasta)))
+
+
+def search_libros_page(
+    db: Session,
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.exact,
+    fields: Optional[Sequence[str]] = None
+) -> LibroPage:
+    stmt, sort_keys = _build_search_query(db, titulo, autor)
+    return _fetch_page(db, stmt, sort_keys, skip, limit, cursor, count, fields=fields)
 
 
 def search_libros(
@@ -89,11 +550,10 @@ def search_libros(
     titulo: Optional[str] = None,
     autor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 10
-) -> List[models.Libro]:
-    query = _build_search_query(db, titulo, autor)
-    query = query.options(joinedload(models.Libro.autor))
-    return query.offset(skip).limit(limit).all()
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> List[Row]:
+    return search_libros_page(db, titulo, autor, skip, limit, cursor).items
 
 
 def count_search_libros(
@@ -101,81 +561,205 @@ def count_search_libros(
     titulo: Optional[str] = None,
     autor: Optional[str] = None
 ) -> int:
-    query = _build_search_query(db, titulo, autor)
-    return query.count()
+    stmt, _ = _build_search_query(db, titulo, autor)
+    return db.scalar(_count_statement(stmt))
 
 
-def create_libro(db: Session, libro: schemas.LibroCreate) -> models.Libro:
-    autor = get_autor(db, libro.autor_id)
-    if not autor:
-        raise ValueError(f"Autor con ID {libro.autor_id} no existe")
+def _integrity_error(e: IntegrityError, autor_id: Optional[int], isbn: Optional[str]) -> ValueError:
+    # Traduce la violación de restricción al mismo mensaje que antes validaba el código
+    mensaje = str(e.orig).lower()
+    if "foreign key" in mensaje:
+        return ValueError(f"Autor con ID {autor_id} no existe")
+    if "unique" in mensaje or "duplicate" in mensaje:
+        return ValueError(f"Libro con ISBN {isbn} ya existe")
+    return ValueError(f"No se pudo guardar el libro: {e.orig}")
+
+
+def _returning_libro(db: Session, statement) -> Optional[models.Libro]:
+    if _dialect_name(db) == "postgresql":
+        # DML ... RETURNING en una CTE unida al autor: fila y autor en una sola consulta
+        modificado = statement.returning(*models.Libro.__table__.c).cte("libro_modificado")
+        libro = aliased(models.Libro, modificado)
+        return db.scalars(
+            select(libro)
+            .join(libro.autor)
+            .options(contains_eager(libro.autor))
+            .execution_options(populate_existing=True)
+        ).one_or_none()
     
+    # SQLite no admite DML dentro de una CTE: RETURNING y el autor desde la caché
+    db_libro = db.scalars(
+        statement.returning(models.Libro).execution_options(populate_existing=True)
+    ).one_or_none()
+    if db_libro:
+        set_committed_value(db_libro, "autor", get_autor(db, db_libro.autor_id))
+    return db_libro
+
+
+def create_libro(db: Session, libro: schemas.LibroCreate) -> models.Libro:
     isbn_clean = libro.isbn.replace('-', '').replace(' ', '')
-    existing = get_libro_by_isbn(db, isbn_clean)
-    if existing:
-        raise ValueError(f"Libro con ISBN {isbn_clean} ya existe")
-    
-    db_libro = models.Libro(
-        titulo=libro.titulo,
-        isbn=isbn_clean,
-        ano_publicacion=libro.ano_publicacion,
-        autor_id=libro.autor_id
-    )
-    db.add(db_libro)
-    db.commit()
-    db.refresh(db_libro)
+    values = {
+        "titulo": libro.titulo,
+        "isbn": isbn_clean,
+        "ano_publicacion": libro.ano_publicacion,
+        "autor_id": libro.autor_id
+    }
     
-    return (
-        db.query(models.Libro)
-        .options(joinedload(models.Libro.autor))
-        .filter(models.Libro.id == db_libro.id)
-        .first()
+    # Las restricciones FOREIGN KEY y UNIQUE validan autor e ISBN en el mismo INSERT
+    try:
+        db_libro = _returning_libro(
+            db,
+            insert(models.Libro).values(**values, created_at=datetime.utcnow(), version=1)
+        )
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise _integrity_error(e, libro.autor_id, isbn_clean)
+    
+    return db_libro
+
+
+def _bulk_insert_chunk(db: Session, chunk: Sequence[Tuple[int, schemas.LibroCreate]]) -> BulkResult:
+    autor_ids = {libro.autor_id for _, libro in chunk}
+    isbns = {libro.isbn for _, libro in chunk}
+    
+    autores_existentes = set(
+        db.scalars(select(models.Autor.id).where(models.Autor.id.in_(autor_ids)))
     )
+    isbns_existentes = set(
+        db.scalars(select(models.Libro.isbn).where(models.Libro.isbn.in_(isbns)))
+    )
+    
+    rows = []
+    errors = []
+    for index, libro in chunk:
+        if libro.autor_id not in autores_existentes:
+            errors.append((index, f"Autor con ID {libro.autor_id} no existe"))
+            continue
+        if libro.isbn in isbns_existentes:
+            errors.append((index, f"Libro con ISBN {libro.isbn} ya existe"))
+            continue
+        isbns_existentes.add(libro.isbn)
+        rows.append({
+            "titulo": libro.titulo,
+            "isbn": libro.isbn,
+            "ano_publicacion": libro.ano_publicacion,
+            "autor_id": libro.autor_id
+        })
+    
+    if not rows:
+        return BulkResult(inserted=0, errors=errors)
+    
+    try:
+        db.execute(insert(models.Libro), rows)
+        db.commit()
+    except IntegrityError as e:
+        # Otra transacción insertó un ISBN o borró un autor entre la validación y el INSERT
+        db.rollback()
+        validos = {index for index, _ in chunk} - {index for index, _ in errors}
+        errors.extend((index, f"Lote rechazado: {e.orig}") for index in sorted(validos))
+        return BulkResult(inserted=0, errors=errors)
+    
+    return BulkResult(inserted=len(rows), errors=errors)
+
+
+def bulk_create_libros(
+    db: Session,
+    libros: Sequence[Tuple[int, schemas.LibroCreate]]
+) -> BulkResult:
+    inserted = 0
+    errors = []
+    for start in range(0, len(libros), BULK_CHUNK_SIZE):
+        result = _bulk_insert_chunk(db, libros[start:start + BULK_CHUNK_SIZE])
+        inserted += result.inserted
+        errors.extend(result.errors)
+    return BulkResult(inserted=inserted, errors=errors)
+
+
+def _version_mismatch(libro_id: int) -> ValueError:
+    return ValueError(f"La versión del libro con ID {libro_id} no coincide")
+
+
+def _version_condition(expected_version: Union[int, Sequence[int]]):
+    if isinstance(expected_version, int):
+        return models.Libro.version == expected_version
+    return models.Libro.version.in_(expected_version)
+
+
+def _version_matches(version: int, expected_version: Union[int, Sequence[int]]) -> bool:
+    if isinstance(expected_version, int):
+        return version == expected_version
+    return version in expected_version
+
+
+def _missing_or_mismatch(
+    db: Session,
+    libro_id: int,
+    expected_version: Union[int, Sequence[int], None]
+):
+    # Sin filas afectadas: 404 si no existe, 412 si existía con otra versión
+    if expected_version is not None and get_libro_version(db, libro_id) is not None:
+        raise _version_mismatch(libro_id)
+    return None
 
 
 def update_libro(
     db: Session,
     libro_id: int,
-    libro_update: schemas.LibroUpdate
+    libro_update: schemas.LibroUpdate,
+    expected_version: Union[int, Sequence[int], None] = None
 ) -> Optional[models.Libro]:
-    db_libro = get_libro(db, libro_id)
-    if not db_libro:
-        return None
-    
     update_data = libro_update.model_dump(exclude_unset=True)
     
-    if "autor_id" in update_data:
-        autor = get_autor(db, update_data["autor_id"])
-        if not autor:
-            raise ValueError(f"Autor con ID {update_data['autor_id']} no existe")
+    if not update_data:
+        db_libro = _load_libro(db, libro_id)
+        if db_libro and expected_version is not None and not _version_matches(db_libro.version, expected_version):
+            raise _version_mismatch(libro_id)
+        return db_libro
     
     if "isbn" in update_data:
-        isbn_clean = update_data["isbn"].replace('-', '').replace(' ', '')
-        existing = get_libro_by_isbn(db, isbn_clean)
-        if existing and existing.id != libro_id:
-            raise ValueError(f"Libro con ISBN {isbn_clean} ya existe")
-        update_data["isbn"] = isbn_clean
+        update_data["isbn"] = update_data["isbn"].replace('-', '').replace(' ', '')
     
-    for field, value in update_data.items():
-        setattr(db_libro, field, value)
-    
-    db.commit()
-    db.refresh(db_libro)
+    conditions = [models.Libro.id == libro_id]
+    if expected_version is not None:
+        conditions.append(_version_condition(expected_version))
     
-    return (
-        db.query(models.Libro)
-        .options(joinedload(models.Libro.autor))
-        .filter(models.Libro.id == libro_id)
-        .first()
+    # Un solo UPDATE ... RETURNING; FOREIGN KEY y UNIQUE validan autor e ISBN
+    statement = (
+        update(models.Libro)
+        .where(*conditions)
+        .values(**update_data, version=models.Libro.version + 1)
     )
+    try:
+        db_libro = _returning_libro(db, statement)
+        if db_libro is None:
+            db.rollback()
+            return _missing_or_mismatch(db, libro_id, expected_version)
+        # El ISBN anterior lo descarta get_libro_by_isbn al no coincidir
+        _invalidate_libro(db, libro_id, db_libro.isbn)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise _integrity_error(e, update_data.get("autor_id"), update_data.get("isbn"))
+    
+    return db_libro
 
 
-def delete_libro(db: Session, libro_id: int) -> bool:
-    db_libro = get_libro(db, libro_id)
-    if not db_libro:
+def delete_libro(
+    db: Session,
+    libro_id: int,
+    expected_version: Union[int, Sequence[int], None] = None
+) -> bool:
+    conditions = [models.Libro.id == libro_id]
+    if expected_version is not None:
+        conditions.append(_version_condition(expected_version))
+    
+    isbn = db.scalars(delete(models.Libro).where(*conditions).returning(models.Libro.isbn)).first()
+    if isbn is None:
+        db.rollback()
+        _missing_or_mismatch(db, libro_id, expected_version)
         return False
     
-    db.delete(db_libro)
+    _invalidate_libro(db, libro_id, isbn)
     db.commit()
     return True
-
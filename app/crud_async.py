@@ -0,0 +1,161 @@
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+from sqlalchemy import Row, RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import crud, models, schemas
+
+# Las consultas viven en app.crud; AsyncSession.run_sync las ejecuta sobre el
+# driver asíncrono (asyncpg/aiosqlite) sin ocupar hilos del thread pool.
+
+
+async def get_autor(db: AsyncSession, autor_id: int) -> Optional[models.Autor]:
+    return await db.run_sync(crud.get_autor, autor_id)
+
+
+async def get_autor_by_nombre(db: AsyncSession, nombre: str) -> Optional[models.Autor]:
+    return await db.run_sync(crud.get_autor_by_nombre, nombre)
+
+
+async def create_autor(db: AsyncSession, autor: schemas.AutorCreate) -> models.Autor:
+    return await db.run_sync(crud.create_autor, autor)
+
+
+async def delete_autor(db: AsyncSession, autor_id: int) -> Optional[int]:
+    return await db.run_sync(crud.delete_autor, autor_id)
+
+
+async def get_libro(db: AsyncSession, libro_id: int) -> Optional[models.Libro]:
+    return await db.run_sync(crud.get_libro, libro_id)
+
+
+async def get_libro_fields(db: AsyncSession, libro_id: int, fields: Sequence[str]) -> Optional[Row]:
+    return await db.run_sync(crud.get_libro_fields, libro_id, fields)
+
+
+async def get_libros_batch(
+    db: AsyncSession,
+    ids: Optional[Sequence[int]] = None,
+    isbns: Optional[Sequence[str]] = None,
+    fields: Optional[Sequence[str]] = None
+) -> List[Optional[Row]]:
+    return await db.run_sync(crud.get_libros_batch, ids, isbns, fields)
+
+
+async def get_libro_version(db: AsyncSession, libro_id: int) -> Optional[int]:
+    return await db.run_sync(crud.get_libro_version, libro_id)
+
+
+async def get_libro_by_isbn(db: AsyncSession, isbn: str) -> Optional[models.Libro]:
+    return await db.run_sync(crud.get_libro_by_isbn, isbn)
+
+
+async def get_libros_page(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 10,
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.exact,
+    fields: Optional[Sequence[str]] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None,
+    sort: schemas.LibroSort = schemas.LibroSort.id
+) -> crud.LibroPage:
+    return await db.run_sync(
+        crud.get_libros_page, skip, limit, autor_id, ano, cursor, count, fields, ano_desde, ano_hasta, sort
+    )
+
+
+async def get_libros(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 10,
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    cursor: Optional[str] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None,
+    sort: schemas.LibroSort = schemas.LibroSort.id
+) -> List[Row]:
+    return await db.run_sync(crud.get_libros, skip, limit, autor_id, ano, cursor, ano_desde, ano_hasta, sort)
+
+
+async def stream_libros_export(
+    db: AsyncSession,
+    autor_id: Optional[int] = None,
+    ano: Optional[int] = None
+) -> AsyncIterator[Sequence[RowMapping]]:
+    # Cursor del lado del servidor: en memoria solo vive un lote a la vez
+    result = await db.stream(crud.export_libros_statement(autor_id, ano))
+    async for partition in result.mappings().partitions():
+        yield partition
+
+
+async def count_libros(
+    db: AsyncSession,
+    autor_id: Union[int, Sequence[int], None] = None,
+    ano: Optional[int] = None,
+    ano_desde: Optional[int] = None,
+    ano_hasta: Optional[int] = None
+) -> int:
+    return await db.run_sync(crud.count_libros, autor_id, ano, ano_desde, ano_hasta)
+
+
+async def search_libros_page(
+    db: AsyncSession,
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    count: schemas.CountStrategy = schemas.CountStrategy.exact,
+    fields: Optional[Sequence[str]] = None
+) -> crud.LibroPage:
+    return await db.run_sync(crud.search_libros_page, titulo, autor, skip, limit, cursor, count, fields)
+
+
+async def search_libros(
+    db: AsyncSession,
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> List[Row]:
+    return await db.run_sync(crud.search_libros, titulo, autor, skip, limit, cursor)
+
+
+async def count_search_libros(
+    db: AsyncSession,
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None
+) -> int:
+    return await db.run_sync(crud.count_search_libros, titulo, autor)
+
+
+async def create_libro(db: AsyncSession, libro: schemas.LibroCreate) -> models.Libro:
+    return await db.run_sync(crud.create_libro, libro)
+
+
+async def bulk_create_libros(
+    db: AsyncSession,
+    libros: Sequence[Tuple[int, schemas.LibroCreate]]
+) -> crud.BulkResult:
+    return await db.run_sync(crud.bulk_create_libros, libros)
+
+
+async def update_libro(
+    db: AsyncSession,
+    libro_id: int,
+    libro_update: schemas.LibroUpdate,
+    expected_version: Union[int, Sequence[int], None] = None
+) -> Optional[models.Libro]:
+    return await db.run_sync(crud.update_libro, libro_id, libro_update, expected_version)
+
+
+async def delete_libro(
+    db: AsyncSession,
+    libro_id: int,
+    expected_version: Union[int, Sequence[int], None] = None
+) -> bool:
+    return await db.run_sync(crud.delete_libro, libro_id, expected_version)
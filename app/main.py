@@ -1,9 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+import csv
+import io
+import json
+import orjson
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import Optional
-from app import crud, schemas
-from app.database import get_db, init_db
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import crud, crud_async, schemas
+from app.cache import cache
+from app.cache_bus import bus
+from app.database import async_engine, check_schema_version, engine, get_db
+from app.metrics import MetricsMiddleware, QueryTimingMiddleware, render_pools, request_metrics
+from app.profiling import ProfilingMiddleware, profiling_enabled
 
 
 def _to_http_error(e: ValueError):
@@ -12,11 +22,217 @@ def _to_http_error(e: ValueError):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=msg)
     if "no existe" in msg:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=msg)
+    if "versión" in msg and "no coincide" in msg:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=msg)
     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=msg)
 
 
-def _serialize_libros(libros):
-    return [schemas.LibroResponse.model_validate(libro).model_dump() for libro in libros]
+def _etag(libro_id: int, version: int, fields: Optional[List[str]] = None) -> str:
+    # Cada representación parcial (?fields=) tiene su propio ETag; "+" porque las comas separan etiquetas
+    if fields is not None:
+        return f'"{libro_id}.{version}.{"+".join(fields)}"'
+    return f'"{libro_id}.{version}"'
+
+
+def _parse_etags(header: str):
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in _parse_etags(if_none_match)]
+    return "*" in tags or etag in tags
+
+
+def _expected_versions(if_match: Optional[str], libro_id: int) -> Optional[List[int]]:
+    if if_match is None or if_match.strip() == "*":
+        return None
+    # Cualquiera de las etiquetas puede coincidir: se aceptan todas las versiones nombradas
+    prefix = f'"{libro_id}.'
+    versions = sorted({
+        int(tag[len(prefix):-1]) for tag in _parse_etags(if_match)
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit()
+    })
+    if versions:
+        return versions
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"La versión del libro con ID {libro_id} no coincide"
+    )
+
+
+def _parse_fields(fields: Optional[str]):
+    if fields is None or not fields.strip():
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sorted(requested - set(crud.LIBRO_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos desconocidos: {', '.join(unknown)}"
+        )
+    # Mismo orden de claves que la respuesta completa
+    return [field for field in crud.LIBRO_FIELDS if field in requested]
+
+
+def _check_cursor_params(cursor: Optional[str], skip: int):
+    if cursor and skip:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se puede combinar cursor con skip"
+        )
+
+
+def _check_libros_filters(autor_id: Optional[List[int]], ano_desde: Optional[int], ano_hasta: Optional[int]):
+    if autor_id is not None and len(autor_id) > schemas.BATCH_MAX_KEYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Se admiten como máximo {schemas.BATCH_MAX_KEYS} valores de autor_id"
+        )
+    if ano_desde is not None and ano_hasta is not None and ano_desde > ano_hasta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ano_desde no puede ser mayor que ano_hasta"
+        )
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in e.errors()
+    )
+
+
+async def _iter_bulk_rows(request: Request):
+    if "ndjson" in request.headers.get("content-type", ""):
+        index = 0
+        # Solo se conserva la línea incompleta y se busca el salto en lo recién llegado:
+        # una línea larga repartida en muchos chunks no se vuelve a copiar ni a recorrer
+        buffer = bytearray()
+        async for chunk in request.stream():
+            start = len(buffer)
+            buffer += chunk
+            end = buffer.rfind(b"\n", start)
+            if end == -1:
+                continue
+            for line in bytes(buffer[:end]).split(b"\n"):
+                if line.strip():
+                    yield index, line
+                    index += 1
+            del buffer[:end + 1]
+        if buffer.strip():
+            yield index, bytes(buffer)
+        return
+    
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="JSON inválido")
+    if not isinstance(rows, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Se esperaba un arreglo JSON o NDJSON"
+        )
+    for index, row in enumerate(rows):
+        yield index, row
+
+
+EXPORT_CSV_COLUMNS = [
+    "id", "titulo", "isbn", "ano_publicacion", "autor_id", "autor_nombre", "created_at"
+]
+
+
+def _export_row_to_dict(row) -> dict:
+    return {
+        "titulo": row["titulo"],
+        "isbn": row["isbn"],
+        "ano_publicacion": row["ano_publicacion"],
+        "autor_id": row["autor_id"],
+        "id": row["id"],
+        "autor": {
+            "nombre": row["autor_nombre"],
+            "id": row["autor_id"],
+            "created_at": row["autor_created_at"].isoformat()
+        },
+        "created_at": row["created_at"].isoformat()
+    }
+
+
+async def _export_ndjson(db: AsyncSession, autor_id: Optional[int], ano: Optional[int]):
+    async for partition in crud_async.stream_libros_export(db=db, autor_id=autor_id, ano=ano):
+        yield "".join(
+            json.dumps(_export_row_to_dict(row), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for row in partition
+        ).encode()
+
+
+async def _export_csv(db: AsyncSession, autor_id: Optional[int], ano: Optional[int]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_COLUMNS)
+    async for partition in crud_async.stream_libros_export(db=db, autor_id=autor_id, ano=ano):
+        writer.writerows(
+            [row[column].isoformat() if column == "created_at" else row[column] for column in EXPORT_CSV_COLUMNS]
+            for row in partition
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _libro_to_dict(row, fields=None):
+    # Mismas claves y orden que schemas.LibroResponse, a partir de las columnas de crud.LIBRO_ROW_COLUMNS
+    if fields is None:
+        return {
+            "titulo": row.titulo,
+            "isbn": row.isbn,
+            "ano_publicacion": row.ano_publicacion,
+            "autor_id": row.autor_id,
+            "id": row.id,
+            "autor": {"nombre": row.autor_nombre, "id": row.autor_id, "created_at": row.autor_created_at},
+            "created_at": row.created_at
+        }
+    return {
+        field: (
+            {"nombre": row.autor_nombre, "id": row.autor_id, "created_at": row.autor_created_at}
+            if field == "autor" else getattr(row, field)
+        )
+        for field in fields
+    }
+
+
+def _page_response(page: crud.LibroPage, skip: int, limit: int, fields=None) -> Response:
+    # orjson escribe los bytes directamente: mismo JSON compacto que JSONResponse
+    return Response(
+        content=orjson.dumps({
+            "items": [_libro_to_dict(libro, fields) for libro in page.items],
+            "total": page.total,
+            "skip": skip,
+            "limit": limit,
+            "has_more": page.has_more,
+            "next_cursor": page.next_cursor
+        }),
+        media_type="application/json"
+    )
+
+
+def _batch_response(batch: schemas.LibroBatchRequest, rows, fields=None) -> Response:
+    keys = batch.ids if batch.ids is not None else batch.isbns
+    return Response(
+        content=orjson.dumps({
+            "items": [None if row is None else _libro_to_dict(row, fields) for row in rows],
+            "not_found": [key for key, row in zip(keys, rows) if row is None]
+        }),
+        media_type="application/json"
+    )
+
+
+def _split_keys(value: Optional[str]):
+    if value is None:
+        return None
+    return [key.strip() for key in value.split(",") if key.strip()]
 
 
 app = FastAPI(
@@ -35,58 +251,132 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(QueryTimingMiddleware)
+# Se registra al final para que sea el más externo y mida la petición completa
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    # Sin create_all: cada worker solo comprueba que la base esté en la última migración
+    await check_schema_version()
+    bus.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    bus.stop()
 
 
 @app.get("/health", tags=["Health"])
-def health_check():
+async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
 
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    lines = request_metrics.render() + render_pools({
+        "sync": engine.pool,
+        "async": async_engine.sync_engine.pool
+    })
+    return Response(
+        content="\n".join(lines) + "\n",
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/cache/stats", tags=["Health"])
+async def cache_stats():
+    return cache.stats()
+
+
 @app.post(
     "/libros",
     response_model=schemas.LibroResponse,
     status_code=status.HTTP_201_CREATED,
     tags=["Libros"]
 )
-def create_libro(libro: schemas.LibroCreate, db: Session = Depends(get_db)):
+async def create_libro(libro: schemas.LibroCreate, response: Response, db: AsyncSession = Depends(get_db)):
     try:
-        db_libro = crud.create_libro(db=db, libro=libro)
+        db_libro = await crud_async.create_libro(db=db, libro=libro)
+        response.headers["ETag"] = _etag(db_libro.id, db_libro.version)
         return schemas.LibroResponse.model_validate(db_libro)
     except ValueError as e:
         _to_http_error(e)
 
 
+@app.post("/libros/bulk", response_model=dict, tags=["Libros"])
+async def bulk_create_libros(request: Request, db: AsyncSession = Depends(get_db)):
+    inserted = 0
+    errors = []
+    pending = []
+    
+    async for index, row in _iter_bulk_rows(request):
+        try:
+            if isinstance(row, bytes):
+                row = json.loads(row)
+            pending.append((index, schemas.LibroCreate.model_validate(row)))
+        except ValidationError as e:
+            errors.append((index, _validation_message(e)))
+        except ValueError:
+            errors.append((index, "JSON inválido"))
+        
+        if len(pending) >= crud.BULK_CHUNK_SIZE:
+            result = await crud_async.bulk_create_libros(db=db, libros=pending)
+            inserted += result.inserted
+            errors.extend(result.errors)
+            pending = []
+    
+    if pending:
+        result = await crud_async.bulk_create_libros(db=db, libros=pending)
+        inserted += result.inserted
+        errors.extend(result.errors)
+    
+    return {
+        "inserted": inserted,
+        "errors": [{"index": index, "detail": detail} for index, detail in sorted(errors)]
+    }
+
+
 @app.get("/libros", response_model=dict, tags=["Libros"])
-def list_libros(
-    autor_id: Optional[int] = Query(None),
+async def list_libros(
+    autor_id: Optional[List[int]] = Query(None),
     ano: Optional[int] = Query(None),
+    ano_desde: Optional[int] = Query(None),
+    ano_hasta: Optional[int] = Query(None),
+    sort: schemas.LibroSort = Query(schemas.LibroSort.id),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    count: schemas.CountStrategy = Query(schemas.CountStrategy.exact),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
 ):
-    libros = crud.get_libros(db=db, skip=skip, limit=limit, autor_id=autor_id, ano=ano)
-    total = crud.count_libros(db=db, autor_id=autor_id, ano=ano)
-    
-    items = _serialize_libros(libros)
+    _check_cursor_params(cursor, skip)
+    _check_libros_filters(autor_id, ano_desde, ano_hasta)
+    fields = _parse_fields(fields)
+    try:
+        page = await crud_async.get_libros_page(
+            db=db, skip=skip, limit=limit, autor_id=autor_id, ano=ano, cursor=cursor,
+            count=count, fields=fields, ano_desde=ano_desde, ano_hasta=ano_hasta, sort=sort
+        )
+    except ValueError as e:
+        _to_http_error(e)
     
-    return {
-        "items": items,
-        "total": total,
-        "skip": skip,
-        "limit": limit
-    }
+    return _page_response(page, skip, limit, fields)
 
 
 @app.get("/libros/buscar", response_model=dict, tags=["Libros"])
-def search_libros(
+async def search_libros(
     titulo: Optional[str] = Query(default=None),
     autor: Optional[str] = Query(default=None),
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None),
+    count: schemas.CountStrategy = Query(schemas.CountStrategy.exact),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
 ):
     titulo = titulo.strip() if titulo and titulo.strip() else None
     autor = autor.strip() if autor and autor.strip() else None
@@ -97,47 +387,141 @@ def search_libros(
             detail="Se requiere al menos titulo o autor"
         )
     
-    libros = crud.search_libros(db=db, titulo=titulo, autor=autor, skip=skip, limit=limit)
-    total = crud.count_search_libros(db=db, titulo=titulo, autor=autor)
-    
-    items = _serialize_libros(libros)
+    _check_cursor_params(cursor, skip)
+    fields = _parse_fields(fields)
+    try:
+        page = await crud_async.search_libros_page(
+            db=db, titulo=titulo, autor=autor, skip=skip, limit=limit, cursor=cursor,
+            count=count, fields=fields
+        )
+    except ValueError as e:
+        _to_http_error(e)
     
-    return {
-        "items": items,
-        "total": total,
-        "skip": skip,
-        "limit": limit
-    }
+    return _page_response(page, skip, limit, fields)
+
+
+@app.get("/libros/export", tags=["Libros"])
+async def export_libros(
+    formato: schemas.ExportFormat = Query(schemas.ExportFormat.ndjson, alias="format"),
+    autor_id: Optional[int] = Query(None),
+    ano: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    if formato == schemas.ExportFormat.csv:
+        return StreamingResponse(
+            _export_csv(db, autor_id, ano),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="libros.csv"'}
+        )
+    return StreamingResponse(_export_ndjson(db, autor_id, ano), media_type="application/x-ndjson")
+
+
+@app.get("/libros/batch", response_model=dict, tags=["Libros"])
+async def get_libros_batch(
+    ids: Optional[str] = Query(None),
+    isbns: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        batch = schemas.LibroBatchRequest(ids=_split_keys(ids), isbns=_split_keys(isbns))
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_validation_message(e))
+    fields = _parse_fields(fields)
+    rows = await crud_async.get_libros_batch(db=db, ids=batch.ids, isbns=batch.isbns, fields=fields)
+    return _batch_response(batch, rows, fields)
+
+
+@app.post("/libros/batch", response_model=dict, tags=["Libros"])
+async def post_libros_batch(
+    batch: schemas.LibroBatchRequest,
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    fields = _parse_fields(fields)
+    rows = await crud_async.get_libros_batch(db=db, ids=batch.ids, isbns=batch.isbns, fields=fields)
+    return _batch_response(batch, rows, fields)
 
 
 @app.get("/libros/{libro_id}", response_model=schemas.LibroResponse, tags=["Libros"])
-def get_libro(libro_id: int, db: Session = Depends(get_db)):
-    db_libro = crud.get_libro(db=db, libro_id=libro_id)
+async def get_libro(
+    libro_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    fields = _parse_fields(fields)
+    if if_none_match:
+        # Revalidación: solo se lee la versión, sin join ni serialización
+        version = await crud_async.get_libro_version(db=db, libro_id=libro_id)
+        if version is not None and _etag_matches(if_none_match, _etag(libro_id, version, fields)):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": _etag(libro_id, version, fields)}
+            )
+    
+    if fields is not None:
+        # Solo las columnas pedidas; sin campos del autor no hay join
+        row = await crud_async.get_libro_fields(db=db, libro_id=libro_id, fields=fields)
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Libro con ID {libro_id} no encontrado"
+            )
+        return Response(
+            content=orjson.dumps(_libro_to_dict(row, fields)),
+            media_type="application/json",
+            headers={"ETag": _etag(libro_id, row.libro_version, fields)}
+        )
+    
+    db_libro = await crud_async.get_libro(db=db, libro_id=libro_id)
     if db_libro is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Libro con ID {libro_id} no encontrado"
         )
+    response.headers["ETag"] = _etag(db_libro.id, db_libro.version)
     return schemas.LibroResponse.model_validate(db_libro)
 
 
 @app.put("/libros/{libro_id}", response_model=schemas.LibroResponse, tags=["Libros"])
-def update_libro(libro_id: int, libro_update: schemas.LibroUpdate, db: Session = Depends(get_db)):
+async def update_libro(
+    libro_id: int,
+    libro_update: schemas.LibroUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    expected_version = _expected_versions(if_match, libro_id)
     try:
-        db_libro = crud.update_libro(db=db, libro_id=libro_id, libro_update=libro_update)
+        db_libro = await crud_async.update_libro(
+            db=db, libro_id=libro_id, libro_update=libro_update, expected_version=expected_version
+        )
         if db_libro is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Libro con ID {libro_id} no encontrado"
             )
+        response.headers["ETag"] = _etag(db_libro.id, db_libro.version)
         return schemas.LibroResponse.model_validate(db_libro)
     except ValueError as e:
         _to_http_error(e)
 
 
 @app.delete("/libros/{libro_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Libros"])
-def delete_libro(libro_id: int, db: Session = Depends(get_db)):
-    deleted = crud.delete_libro(db=db, libro_id=libro_id)
+async def delete_libro(
+    libro_id: int,
+    if_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    expected_version = _expected_versions(if_match, libro_id)
+    try:
+        deleted = await crud_async.delete_libro(
+            db=db, libro_id=libro_id, expected_version=expected_version
+        )
+    except ValueError as e:
+        _to_http_error(e)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,3 +529,13 @@ def delete_libro(libro_id: int, db: Session = Depends(get_db)):
         )
     return None
 
+
+@app.delete("/autores/{autor_id}", response_model=dict, tags=["Autores"])
+async def delete_autor(autor_id: int, db: AsyncSession = Depends(get_db)):
+    deleted_libros = await crud_async.delete_autor(db=db, autor_id=autor_id)
+    if deleted_libros is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Autor con ID {autor_id} no encontrado"
+        )
+    return {"id": autor_id, "deleted_libros": deleted_libros}
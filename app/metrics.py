@@ -0,0 +1,170 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+from sqlalchemy.pool import QueuePool
+from app.database import QueryStats, query_stats
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "sin_ruta"
+
+# En desarrollo, avisa cuando una petición ejecuta más consultas que esto (0 lo desactiva)
+SQL_QUERY_WARN_COUNT = int(os.getenv("SQL_QUERY_WARN_COUNT", "0"))
+
+RequestKey = Tuple[str, str, int]
+
+
+class RequestMetrics:
+    # Todo se actualiza desde el event loop: sin locks, solo sumas y un bisect por petición
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_progress = 0
+        self._series: Dict[RequestKey, list] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        serie = self._series.get((method, route, status))
+        if serie is None:
+            # [conteo por bucket (no acumulado, último = +Inf), suma, total]
+            serie = self._series[(method, route, status)] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        serie[0][bisect_left(self.buckets, seconds)] += 1
+        serie[1] += seconds
+        serie[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [
+            "# HELP http_requests_total Peticiones HTTP atendidas",
+            "# TYPE http_requests_total counter",
+        ]
+        series = sorted(self._series.items())
+        for (method, route, status), (_, _, total) in series:
+            lines.append(f'http_requests_total{{{_labels(method, route, status)}}} {total}')
+
+        lines += [
+            "# HELP http_request_duration_seconds Latencia de las peticiones HTTP",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), (counts, suma, total) in series:
+            labels = _labels(method, route, status)
+            acumulado = 0
+            for limite, count in zip(self.buckets, counts):
+                acumulado += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{limite}"}} {acumulado}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {suma}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {total}')
+
+        lines += [
+            "# HELP http_requests_in_progress Peticiones HTTP en curso",
+            "# TYPE http_requests_in_progress gauge",
+            f"http_requests_in_progress {self.in_progress}",
+        ]
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(method: str, route: str, status: int) -> str:
+    return f'method="{method}",route="{_escape(route)}",status="{status}"'
+
+
+POOL_GAUGES = (
+    ("db_pool_size", "gauge", "Conexiones que mantiene el pool", lambda pool: pool.size()),
+    ("db_pool_checked_out", "gauge", "Conexiones prestadas en este momento", lambda pool: pool.checkedout()),
+    # overflow() parte de -pool_size mientras el pool no ha abierto todas sus conexiones
+    ("db_pool_overflow", "gauge", "Conexiones abiertas por encima de pool_size",
+     lambda pool: max(0, pool.overflow())),
+    ("db_pool_wait_seconds_total", "counter", "Tiempo acumulado esperando una conexión libre del pool",
+     lambda pool: getattr(pool, "wait_seconds", 0.0)),
+    ("db_pool_checkouts_total", "counter", "Conexiones obtenidas del pool", lambda pool: getattr(pool, "checkouts", 0)),
+)
+
+
+def render_pools(pools: Dict[str, object]) -> List[str]:
+    # Solo los pools con cola (QueuePool) tienen tamaño y overflow; NullPool no se reporta
+    pools = {name: pool for name, pool in pools.items() if isinstance(pool, QueuePool)}
+    lines = []
+    for metric, tipo, ayuda, valor in POOL_GAUGES:
+        lines += [f"# HELP {metric} {ayuda}", f"# TYPE {metric} {tipo}"]
+        for name, pool in pools.items():
+            lines.append(f'{metric}{{engine="{name}"}} {valor(pool)}')
+    return lines
+
+
+class MetricsMiddleware:
+    # Middleware ASGI puro: no crea Request/Response ni tareas, solo envuelve send
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_progress += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_progress -= 1
+            # El router deja la ruta en el scope: se usa la plantilla (/libros/{libro_id}) y no la URL
+            route = scope.get("route")
+            metrics.observe(
+                scope["method"],
+                route.path if route is not None else UNMATCHED_ROUTE,
+                status_code,
+                time.perf_counter() - inicio
+            )
+
+
+class QueryTimingMiddleware:
+    # Atribuye a la petición las consultas que cuentan los hooks de app.database
+    def __init__(self, app, warn_count: int = SQL_QUERY_WARN_COUNT):
+        self.app = app
+        self.warn_count = warn_count
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = query_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Totales hasta que salen las cabeceras (en streaming no incluye lo posterior)
+                timing = f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
+            if self.warn_count and stats.count > self.warn_count:
+                logger.warning(
+                    "%s %s ejecutó %d consultas (límite %d): posible N+1",
+                    scope["method"], scope["path"], stats.count, self.warn_count
+                )
+
+
+request_metrics = RequestMetrics()
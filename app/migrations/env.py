@@ -0,0 +1,64 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from app import models
+from app.database import Base, DATABASE_URL
+
+config = context.config
+
+# Quien invoca Alembic desde el propio proceso (tests) conserva su configuración de logging
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# Solo para alembic revision --autogenerate: los modelos son la referencia del esquema
+target_metadata = Base.metadata
+
+# Los tests y scripts pueden fijar otra URL con config.set_main_option("sqlalchemy.url", ...)
+url = config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def _include_object(dialect_name: str):
+    def include(obj, name, type_, reflected, compare_to):
+        # La tabla FTS5 de SQLite (y sus tablas internas) se crea con SQL propio en las migraciones
+        if type_ == "table" and name.startswith("libros_fts"):
+            return False
+        # Índices con ddl_if (trigramas GIN) que solo existen en su dialecto
+        ddl_if = getattr(obj, "_ddl_if", None)
+        if type_ == "index" and ddl_if is not None and ddl_if.dialect not in (None, dialect_name):
+            return False
+        return True
+    return include
+
+
+def run_migrations_offline():
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        include_object=_include_object(url.split(":", 1)[0].split("+", 1)[0]),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connectable = create_engine(url, poolclass=NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite no admite la mayoría de ALTER TABLE: se recrea la tabla en lote
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_object=_include_object(connection.dialect.name),
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
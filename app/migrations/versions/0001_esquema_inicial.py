@@ -0,0 +1,49 @@
+"""Esquema inicial: autores y libros
+
+Revision ID: 0001_esquema_inicial
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_esquema_inicial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "autores",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nombre", sa.String(200), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_autores_id", "autores", ["id"])
+    op.create_index("ix_autores_nombre", "autores", ["nombre"])
+
+    op.create_table(
+        "libros",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("titulo", sa.String(300), nullable=False),
+        sa.Column("isbn", sa.String(17), nullable=False),
+        sa.Column("ano_publicacion", sa.Integer(), nullable=False),
+        sa.Column(
+            "autor_id", sa.Integer(), sa.ForeignKey("autores.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.CheckConstraint("ano_publicacion > 1000", name="check_ano_valido"),
+    )
+    op.create_index("ix_libros_id", "libros", ["id"])
+    op.create_index("ix_libros_titulo", "libros", ["titulo"])
+    op.create_index("ix_libros_isbn", "libros", ["isbn"], unique=True)
+    op.create_index("ix_libros_ano_publicacion", "libros", ["ano_publicacion"])
+    op.create_index("ix_libros_autor_id", "libros", ["autor_id"])
+
+
+def downgrade():
+    op.drop_table("libros")
+    op.drop_table("autores")
@@ -0,0 +1,75 @@
+"""Índices de búsqueda: pg_trgm en PostgreSQL, FTS5 en SQLite
+
+Revision ID: 0002_busqueda
+Revises: 0001_esquema_inicial
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_busqueda"
+down_revision = "0001_esquema_inicial"
+branch_labels = None
+depends_on = None
+
+# Copia de app.models.SQLITE_FTS_DDL: una migración no depende de cómo evolucionen los modelos
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS libros_fts USING fts5(titulo, autor, tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS libros_fts_insert AFTER INSERT ON libros BEGIN
+        INSERT INTO libros_fts(rowid, titulo, autor)
+        SELECT new.id, new.titulo, autores.nombre FROM autores WHERE autores.id = new.autor_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS libros_fts_update AFTER UPDATE OF titulo, autor_id ON libros BEGIN
+        DELETE FROM libros_fts WHERE rowid = old.id;
+        INSERT INTO libros_fts(rowid, titulo, autor)
+        SELECT new.id, new.titulo, autores.nombre FROM autores WHERE autores.id = new.autor_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS libros_fts_delete AFTER DELETE ON libros BEGIN
+        DELETE FROM libros_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS autores_fts_update AFTER UPDATE OF nombre ON autores BEGIN
+        UPDATE libros_fts SET autor = new.nombre
+        WHERE rowid IN (SELECT id FROM libros WHERE autor_id = new.id);
+    END""",
+]
+
+TRGM_INDEXES = [("ix_autores_nombre_trgm", "autores", "nombre"), ("ix_libros_titulo_trgm", "libros", "titulo")]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # CONCURRENTLY no bloquea escrituras, pero no puede ir dentro de una transacción
+        with op.get_context().autocommit_block():
+            for name, table, column in TRGM_INDEXES:
+                op.create_index(
+                    name, table, [column], postgresql_using="gin",
+                    postgresql_ops={column: "gin_trgm_ops"}, postgresql_concurrently=True,
+                    if_not_exists=True
+                )
+    elif dialect == "sqlite":
+        existia = sa.inspect(op.get_bind()).has_table("libros_fts")
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        if not existia:
+            # Los triggers solo cubren escrituras futuras: se indexan los libros existentes
+            op.execute(
+                "INSERT INTO libros_fts(rowid, titulo, autor) "
+                "SELECT libros.id, libros.titulo, autores.nombre "
+                "FROM libros JOIN autores ON autores.id = libros.autor_id"
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, _ in TRGM_INDEXES:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    elif dialect == "sqlite":
+        for trigger in ("libros_fts_insert", "libros_fts_update", "libros_fts_delete", "autores_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS libros_fts")
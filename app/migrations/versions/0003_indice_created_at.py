@@ -0,0 +1,29 @@
+"""Índice sobre libros.created_at para snapshots incrementales
+
+Revision ID: 0003_indice_created_at
+Revises: 0002_busqueda
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+
+
+revision = "0003_indice_created_at"
+down_revision = "0002_busqueda"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_libros_created_at", "libros", ["created_at"],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_libros_created_at", table_name="libros", postgresql_concurrently=True, if_exists=True
+        )
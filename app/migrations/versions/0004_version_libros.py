@@ -0,0 +1,30 @@
+"""Columna libros.version para ETags y concurrencia optimista
+
+Revision ID: 0004_version_libros
+Revises: 0003_indice_created_at
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_version_libros"
+down_revision = "0003_indice_created_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columnas = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("libros")}
+    if "version" not in columnas:
+        # Con un DEFAULT constante PostgreSQL (11+) no reescribe la tabla
+        op.add_column(
+            "libros", sa.Column("version", sa.Integer(), nullable=False, server_default="1")
+        )
+
+
+def downgrade():
+    # Sin batch_alter_table: recrear libros en SQLite rompería los triggers de FTS
+    # (ALTER TABLE ... DROP COLUMN está disponible desde SQLite 3.35)
+    op.drop_column("libros", "version")
@@ -0,0 +1,44 @@
+"""Índices compuestos para los filtros y órdenes de GET /libros
+
+Revision ID: 0005_indices_compuestos
+Revises: 0004_version_libros
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+
+
+revision = "0005_indices_compuestos"
+down_revision = "0004_version_libros"
+branch_labels = None
+depends_on = None
+
+COMPUESTOS = [
+    ("ix_libros_autor_id_id", ["autor_id", "id"]),
+    ("ix_libros_autor_id_ano_publicacion_id", ["autor_id", "ano_publicacion", "id"]),
+    ("ix_libros_ano_publicacion_id", ["ano_publicacion", "id"]),
+]
+
+# Prefijos de los compuestos: solo encarecían las escrituras
+SIMPLES = [
+    ("ix_libros_autor_id", ["autor_id"]),
+    ("ix_libros_ano_publicacion", ["ano_publicacion"]),
+]
+
+
+def upgrade():
+    # CONCURRENTLY no bloquea escrituras, pero no puede ir dentro de una transacción.
+    # Si falla a medias deja un índice INVALID: borrarlo y volver a ejecutar la migración.
+    with op.get_context().autocommit_block():
+        for name, columns in COMPUESTOS:
+            op.create_index(name, "libros", columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, _ in SIMPLES:
+            op.drop_index(name, table_name="libros", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, columns in SIMPLES:
+            op.create_index(name, "libros", columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, _ in COMPUESTOS:
+            op.drop_index(name, table_name="libros", postgresql_concurrently=True, if_exists=True)
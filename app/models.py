@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, CheckConstraint, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, CheckConstraint, DateTime, DDL, Index, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -11,7 +11,19 @@ class Autor(Base):
     nombre = Column(String(200), nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
-    libros = relationship("Libro", back_populates="autor", cascade="all, delete-orphan")
+    # passive_deletes: el ON DELETE CASCADE de la base de datos borra los libros sin cargarlos
+    libros = relationship(
+        "Libro", back_populates="autor", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_autores_nombre_trgm",
+            "nombre",
+            postgresql_using="gin",
+            postgresql_ops={"nombre": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
 
 class Libro(Base):
@@ -20,13 +32,65 @@ class Libro(Base):
     id = Column(Integer, primary_key=True, index=True)
     titulo = Column(String(300), nullable=False, index=True)
     isbn = Column(String(17), nullable=False, unique=True, index=True)
-    ano_publicacion = Column(Integer, nullable=False, index=True)
-    autor_id = Column(Integer, ForeignKey("autores.id", ondelete="CASCADE"), nullable=False, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    ano_publicacion = Column(Integer, nullable=False)
+    autor_id = Column(Integer, ForeignKey("autores.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     autor = relationship("Autor", back_populates="libros")
 
+    # Cada UPDATE incrementa version y exige la versión leída (concurrencia optimista)
+    __mapper_args__ = {"version_id_col": version}
+
     __table_args__ = (
         CheckConstraint('ano_publicacion > 1000', name='check_ano_valido'),
+        # Filtros de /libros con sus órdenes (id o ano_publicacion, id) sin ordenar en memoria.
+        # Reemplazan a los índices simples de autor_id y ano_publicacion, que son su prefijo.
+        Index("ix_libros_autor_id_id", "autor_id", "id"),
+        Index("ix_libros_autor_id_ano_publicacion_id", "autor_id", "ano_publicacion", "id"),
+        Index("ix_libros_ano_publicacion_id", "ano_publicacion", "id"),
+        Index(
+            "ix_libros_titulo_trgm",
+            "titulo",
+            postgresql_using="gin",
+            postgresql_ops={"titulo": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
     )
 
+
+# Búsqueda en PostgreSQL: índices GIN de trigramas (pg_trgm) que sirven a ILIKE '%term%'
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+# Búsqueda en SQLite: tabla FTS5 con tokenizador trigram sincronizada por triggers
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS libros_fts USING fts5(titulo, autor, tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS libros_fts_insert AFTER INSERT ON libros BEGIN
+        INSERT INTO libros_fts(rowid, titulo, autor)
+        SELECT new.id, new.titulo, autores.nombre FROM autores WHERE autores.id = new.autor_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS libros_fts_update AFTER UPDATE OF titulo, autor_id ON libros BEGIN
+        DELETE FROM libros_fts WHERE rowid = old.id;
+        INSERT INTO libros_fts(rowid, titulo, autor)
+        SELECT new.id, new.titulo, autores.nombre FROM autores WHERE autores.id = new.autor_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS libros_fts_delete AFTER DELETE ON libros BEGIN
+        DELETE FROM libros_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS autores_fts_update AFTER UPDATE OF nombre ON autores BEGIN
+        UPDATE libros_fts SET autor = new.nombre
+        WHERE rowid IN (SELECT id FROM libros WHERE autor_id = new.id);
+    END""",
+]
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(Libro.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    Libro.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS libros_fts").execute_if(dialect="sqlite"),
+)
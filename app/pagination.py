@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy import and_, or_, tuple_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Cursor inválido")
+    # Las claves de orden son numéricas (id, año, relevancia); bool es subclase de int
+    if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in values):
+        raise ValueError("Cursor inválido")
+    return values
+
+
+def keyset_condition(keys: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    # keys: [(columna, descendente), ...] en el mismo orden que el ORDER BY
+    if len(keys) == 1:
+        column, desc = keys[0]
+        return column < values[0] if desc else column > values[0]
+
+    if len({desc for _, desc in keys}) == 1:
+        columns = tuple_(*[column for column, _ in keys])
+        if keys[0][1]:
+            return columns < tuple_(*values)
+        return columns > tuple_(*values)
+
+    conditions = []
+    for i, (column, desc) in enumerate(keys):
+        equals = [keys[j][0] == values[j] for j in range(i)]
+        after = column < values[i] if desc else column > values[i]
+        conditions.append(and_(*equals, after))
+    return or_(*conditions)
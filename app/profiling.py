@@ -0,0 +1,142 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Sequence
+
+# Sin PROFILING_TOKEN ni PROFILING_SAMPLE_RATE el middleware no se registra (cero overhead)
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+PROFILING_FORMAT = os.getenv("PROFILING_FORMAT", "folded")
+PROFILING_PATHS = [path for path in os.getenv("PROFILING_PATHS", "").split(",") if path]
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_FORMATS = ("folded", "pstats")
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILING_TOKEN) or PROFILING_SAMPLE_RATE > 0
+
+
+class SamplingProfiler:
+    # Muestrea la pila del hilo del event loop: tiempo de pared, incluida la espera de I/O
+    def __init__(self, interval: float = PROFILING_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        # Formato "folded" de flamegraph.pl / speedscope: una pila por línea y su número de muestras
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class DeterministicProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def dump(self, path: str):
+        self._profile.dump_stats(path)
+
+
+def _profile_name(method: str, path: str, formato: str) -> str:
+    ruta = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    extension = "folded" if formato == "folded" else "prof"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}_{method}_{ruta}_{uuid.uuid4().hex[:8]}.{extension}"
+
+
+class ProfilingMiddleware:
+    # Perfila peticiones con la cabecera X-Profile-Token o una fracción aleatoria de ellas.
+    # El perfil cubre todo el event loop: el trabajo de peticiones concurrentes también aparece.
+    def __init__(
+        self,
+        app,
+        token: Optional[str] = PROFILING_TOKEN,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        output_dir: str = PROFILING_DIR,
+        formato: str = PROFILING_FORMAT,
+        paths: Sequence[str] = PROFILING_PATHS
+    ):
+        if formato not in PROFILE_FORMATS:
+            raise ValueError(f"Formato de perfil {formato} no soportado")
+        self.app = app
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.formato = formato
+        self.paths = tuple(paths)
+        self._active = False
+
+    def _should_profile(self, scope) -> bool:
+        # Un solo perfil a la vez: cProfile no admite dos activos en el mismo hilo
+        if self._active:
+            return False
+        if self.paths and not scope["path"].startswith(self.paths):
+            return False
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        name = _profile_name(scope["method"], scope["path"], self.formato)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", name.encode())
+                ]
+            await send(message)
+
+        profiler = SamplingProfiler() if self.formato == "folded" else DeterministicProfiler()
+        self._active = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self._active = False
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiler.dump(os.path.join(self.output_dir, name))
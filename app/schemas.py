@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from enum import Enum
 
 
 def _clean_isbn(isbn: str) -> str:
@@ -98,6 +99,24 @@ class LibroResponse(LibroBase):
         from_attributes = True
 
 
+class CountStrategy(str, Enum):
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
+
+
+class LibroSort(str, Enum):
+    id = "id"
+    id_desc = "-id"
+    ano_publicacion = "ano_publicacion"
+    ano_publicacion_desc = "-ano_publicacion"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 class LibroSearchParams(BaseModel):
     titulo: Optional[str] = None
     autor: Optional[str] = None
@@ -110,4 +129,15 @@ class LibroListParams(BaseModel):
     limit: int = Field(10, ge=1, le=100)
 
 
+BATCH_MAX_KEYS = 200
+
 
+class LibroBatchRequest(BaseModel):
+    ids: Optional[List[int]] = Field(None, max_length=BATCH_MAX_KEYS)
+    isbns: Optional[List[str]] = Field(None, max_length=BATCH_MAX_KEYS)
+    
+    @model_validator(mode='after')
+    def validate_one_key_type(self):
+        if (self.ids is None) == (self.isbns is None):
+            raise ValueError('Se requiere ids o isbns, pero no ambos')
+        return self
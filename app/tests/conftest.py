@@ -1,10 +1,19 @@
+import os
+
+# Los tests usan SQLite: el bus de invalidación no puede usar LISTEN/NOTIFY
+os.environ.setdefault("CACHE_BUS", "memory")
+
 import pytest
+import pytest_asyncio
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
-from app.database import Base, get_db
+from app.cache import cache
+from app import database
+from app.database import Base, get_db, stamp_schema, to_async_url
 from app.main import app
-import os
 
 # Base de datos de prueba en memoria (SQLite)
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -14,10 +23,20 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Cada TestClient corre su propio event loop, así que no se reutilizan conexiones
+async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(scope="function")
 def db():
+    cache.clear()
     Base.metadata.create_all(bind=engine)
+    # El esquema sale de los modelos: se marca en la última migración
+    with engine.begin() as conn:
+        stamp_schema(conn)
     db = TestingSessionLocal()
     try:
         yield db
@@ -26,13 +45,20 @@ def db():
         Base.metadata.drop_all(bind=engine)
 
 
+@pytest_asyncio.fixture(scope="function")
+async def async_db(db):
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
+
 @pytest.fixture(scope="function")
-def client(db):
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            pass
+def client(db, monkeypatch):
+    # El arranque comprueba la revisión del esquema: contra la base de test, no la de DATABASE_URL
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
     
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as test_client:
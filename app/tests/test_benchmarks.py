@@ -0,0 +1,82 @@
+import httpx
+import pytest
+import random
+from collections import Counter
+from sqlalchemy import func, select
+from app import models
+from app.main import app
+from app.tests.conftest import engine
+from benchmarks.generate import REFERENCE_YEAR, generate_catalog, generate_libros
+from benchmarks.load import percentile, run_benchmark, select_scenarios, summarize
+
+
+def test_generate_catalog(db):
+    assert generate_catalog(engine, libros=500, autores=50, seed=7) == (50, 500)
+
+    conteos = db.execute(
+        select(func.count()).select_from(models.Libro).group_by(models.Libro.autor_id)
+        .order_by(func.count().desc())
+    ).scalars().all()
+    assert sum(conteos) == 500
+    # Zipf: el autor más prolífico acumula muchos más libros que la media
+    assert conteos[0] > 5 * 500 / 50
+
+    isbns = db.execute(select(models.Libro.isbn).order_by(models.Libro.id).limit(3)).scalars().all()
+    generate_catalog(engine, libros=500, autores=50, seed=7)
+    db.expire_all()
+    assert db.execute(select(models.Libro.isbn).order_by(models.Libro.id).limit(3)).scalars().all() == isbns
+
+
+def test_generate_catalog_no_reset_appends(db):
+    generate_catalog(engine, libros=300, autores=20, seed=7)
+    # Sin reset los ids (y los ISBN que salen de ellos) continúan detrás de los existentes
+    assert generate_catalog(engine, libros=200, autores=10, seed=8, reset=False) == (10, 200)
+    
+    assert db.scalar(select(func.count()).select_from(models.Libro)) == 500
+    assert db.scalar(select(func.count(func.distinct(models.Libro.isbn)))) == 500
+    assert db.scalar(select(func.count()).select_from(models.Autor)) == 30
+    assert db.scalar(select(func.min(models.Libro.autor_id)).where(models.Libro.id > 300)) > 20
+
+
+def test_generate_libros_reference_year():
+    libros = list(generate_libros(random.Random(3), 2000, 100, 1.0, ano_referencia=2010))
+    assert max(libro["ano_publicacion"] for libro in libros) == 2010
+    # El año de referencia es fijo: la misma semilla da los mismos datos sin importar la fecha
+    assert list(generate_libros(random.Random(3), 50, 10, 1.0)) == list(
+        generate_libros(random.Random(3), 50, 10, 1.0, ano_referencia=REFERENCE_YEAR)
+    )
+
+
+def test_percentile_and_summary():
+    latencias = [i / 1000 for i in range(1, 101)]
+    assert percentile(latencias, 50) == 0.05
+    assert percentile(latencias, 99) == 0.099
+    assert percentile([], 95) == 0.0
+
+    resumen = summarize(latencias, Counter({200: 99, 500: 1}), errors=1, seconds=2.0)
+    assert resumen["requests"] == 100
+    assert resumen["throughput_rps"] == 50.0
+    assert resumen["latency_ms"]["p95"] == 95.0
+    assert resumen["status"] == {"200": 99, "500": 1}
+
+
+def test_select_scenarios():
+    nombres = [scenario.name for scenario in select_scenarios(None)]
+    assert "list_libros" in nombres
+    assert "delete_autor" not in nombres
+    with pytest.raises(SystemExit):
+        select_scenarios(["no_existe"])
+
+
+@pytest.mark.asyncio
+async def test_run_benchmark(client):
+    generate_catalog(engine, libros=200, autores=10, seed=1)
+    escenarios = select_scenarios(["get_libro", "create_libro", "delete_libro", "search_titulo"])
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        resultados = await run_benchmark(http, escenarios, concurrency=2, duration=0.2, warmup=0, seed=1)
+
+    assert list(resultados) == ["get_libro", "create_libro", "delete_libro", "search_titulo"]
+    for resultado in resultados.values():
+        assert resultado["requests"] > 0
+        assert resultado["errors"] == 0
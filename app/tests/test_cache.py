@@ -0,0 +1,155 @@
+from sqlalchemy import event
+from app import crud, schemas
+from app.cache import LRUCache, cache
+from app.tests.conftest import TestingSessionLocal
+
+
+def test_lru_cache_evicts_least_recent():
+    lru = LRUCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert lru.stats()["hits"] == 3
+    assert lru.stats()["misses"] == 1
+
+
+def test_lru_cache_ttl_and_disabled():
+    lru = LRUCache(maxsize=10, ttl=-1)
+    lru.set("a", 1)
+    assert lru.get("a") is None
+    
+    disabled = LRUCache(maxsize=10, ttl=60, enabled=False)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+
+def test_lru_cache_delete_where():
+    lru = LRUCache(maxsize=10, ttl=60)
+    for i in range(4):
+        lru.set(("libro", i), i)
+    
+    assert lru.delete_where(lambda key, value: value % 2 == 0) == 2
+    assert lru.get(("libro", 0)) is None
+    assert lru.get(("libro", 1)) == 1
+
+
+def test_lru_cache_generation_skips_stale_set():
+    lru = LRUCache(maxsize=10, ttl=60)
+    generation = lru.generation("a")
+    lru.delete("a")
+    lru.set("a", "viejo", generation)
+    assert lru.get("a") is None
+    
+    generation = lru.generation("a")
+    lru.set("a", "nuevo", generation)
+    assert lru.get("a") == "nuevo"
+    
+    generation = lru.generation("b")
+    lru.delete_where(lambda key, value: False)
+    lru.set("b", "viejo", generation)
+    assert lru.get("b") is None
+
+
+def _count_statements(db, fn):
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return result, len(statements)
+
+
+def test_get_libro_served_from_cache(db, sample_autor_data, sample_libro_data):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    libro_id = db_libro.id
+    
+    crud.get_libro(db=db, libro_id=libro_id)
+    db.expunge_all()
+    
+    libro, statements = _count_statements(db, lambda: crud.get_libro(db=db, libro_id=libro_id))
+    assert statements == 0
+    assert libro.titulo == sample_libro_data["titulo"]
+    assert libro.autor.nombre == sample_autor_data["nombre"]
+    assert cache.stats()["hits"] >= 1
+
+
+def test_update_and_delete_invalidate_cache(db, sample_autor_data, sample_libro_data):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    libro_id = db_libro.id
+    isbn = db_libro.isbn
+    
+    crud.get_libro(db=db, libro_id=libro_id)
+    crud.get_libro_by_isbn(db=db, isbn=isbn)
+    crud.update_libro(db=db, libro_id=libro_id, libro_update=schemas.LibroUpdate(isbn="9876543210"))
+    db.expunge_all()
+    
+    assert crud.get_libro(db=db, libro_id=libro_id).isbn == "9876543210"
+    assert crud.get_libro_by_isbn(db=db, isbn=isbn) is None
+    
+    crud.delete_libro(db=db, libro_id=libro_id)
+    db.expunge_all()
+    assert crud.get_libro(db=db, libro_id=libro_id) is None
+    assert crud.get_libro_by_isbn(db=db, isbn="9876543210") is None
+
+
+def test_cache_stats_endpoint(client):
+    response = client.get("/cache/stats")
+    assert response.status_code == 200
+    assert set(response.json()) >= {"enabled", "hits", "misses", "size"}
+
+
+def test_delete_autor_purges_cached_libros(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    libro_id = db_libro.id
+    crud.get_libro(db=db, libro_id=libro_id)
+    crud.get_libro_by_isbn(db=db, isbn=sample_libro_data["isbn"])
+    
+    assert crud.delete_autor(db=db, autor_id=db_autor.id) == 1
+    db.expunge_all()
+    
+    assert crud.get_libro(db=db, libro_id=libro_id) is None
+    assert crud.get_libro_by_isbn(db=db, isbn=sample_libro_data["isbn"]) is None
+
+
+def test_get_libro_skips_cache_when_updated_during_load(db, sample_autor_data, sample_libro_data, monkeypatch):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    libro_id = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data)).id
+    load_libro = crud._load_libro
+    
+    def load_and_update(session, libro_id):
+        libro = load_libro(session, libro_id)
+        # Otra petición confirma una actualización mientras esta lectura está en curso
+        otra = TestingSessionLocal()
+        try:
+            crud.update_libro(db=otra, libro_id=libro_id, libro_update=schemas.LibroUpdate(titulo="Nuevo"))
+        finally:
+            otra.close()
+        return libro
+    
+    monkeypatch.setattr(crud, "_load_libro", load_and_update)
+    assert crud.get_libro(db=db, libro_id=libro_id).titulo == sample_libro_data["titulo"]
+    monkeypatch.undo()
+    
+    assert cache.get(("libro", libro_id)) is None
+    db.expunge_all()
+    assert crud.get_libro(db=db, libro_id=libro_id).titulo == "Nuevo"
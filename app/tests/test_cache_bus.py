@@ -0,0 +1,96 @@
+import json
+import threading
+from app import crud, schemas
+from app.cache import LRUCache
+from app.cache_bus import NOTIFY_MAX_PAYLOAD, PostgresBus, _chunk_payloads, bus
+
+
+def _otro_worker():
+    otra_cache = LRUCache(maxsize=100, ttl=60)
+    
+    def invalidate(keys):
+        otra_cache.delete(*keys)
+    
+    bus.subscribe(invalidate)
+    return otra_cache, invalidate
+
+
+def test_writes_invalidate_other_workers(db, sample_autor_data, sample_libro_data):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    
+    otra_cache, invalidate = _otro_worker()
+    try:
+        otra_cache.set(("libro", db_libro.id), "obsoleto")
+        otra_cache.set(("isbn", db_libro.isbn), db_libro.id)
+        
+        crud.update_libro(db=db, libro_id=db_libro.id, libro_update=schemas.LibroUpdate(titulo="Otro"))
+        assert otra_cache.get(("libro", db_libro.id)) is None
+        assert otra_cache.get(("isbn", db_libro.isbn)) is None
+        
+        otra_cache.set(("libro", db_libro.id), "obsoleto")
+        crud.delete_libro(db=db, libro_id=db_libro.id)
+        assert otra_cache.get(("libro", db_libro.id)) is None
+    finally:
+        bus.unsubscribe(invalidate)
+
+
+def test_failed_write_does_not_invalidate(db, sample_autor_data, sample_libro_data):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    
+    recibidas = []
+    bus.subscribe(recibidas.append)
+    try:
+        bus.publish(db, [("libro", db_libro.id)])
+        db.rollback()
+        db.commit()
+    finally:
+        bus.unsubscribe(recibidas.append)
+    
+    assert recibidas == []
+
+
+def test_inserts_do_not_publish(db, sample_autor_data, sample_libro_data):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    
+    recibidas = []
+    bus.subscribe(recibidas.append)
+    try:
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+        resultado = crud.bulk_create_libros(db=db, libros=[
+            (0, schemas.LibroCreate(titulo="Otro", isbn="9780306406157", ano_publicacion=2000, autor_id=db_autor.id))
+        ])
+        assert resultado.inserted == 1
+    finally:
+        bus.unsubscribe(recibidas.append)
+    
+    # Ninguna caché puede tener aún esos libros: no hay nada que invalidar
+    assert recibidas == []
+
+
+def test_postgres_bus_notifies_after_commit_in_batches():
+    # Sin servidor: solo se ejercita el hilo publicador
+    pg_bus = PostgresBus("postgresql://postgres@/nada?host=/no-existe")
+    enviadas = []
+    pg_bus._notify = enviadas.append
+    pg_bus._publisher = threading.Thread(target=pg_bus._publish)
+    
+    pg_bus.send([("libro", 1), ("isbn", "9780306406157")])
+    pg_bus.send([("libro", 1), ("libro", 2)])
+    pg_bus._publisher.start()
+    pg_bus.stop()
+    
+    assert enviadas == [[("libro", 1), ("isbn", "9780306406157"), ("libro", 2)]]
+
+
+def test_chunk_payloads_respects_notify_limit():
+    keys = [("isbn", f"9781234567{i:03d}") for i in range(1000)]
+    payloads = list(_chunk_payloads(keys))
+    
+    assert len(payloads) > 1
+    assert all(len(payload) <= NOTIFY_MAX_PAYLOAD for payload in payloads)
+    assert [tuple(key) for payload in payloads for key in json.loads(payload)] == keys
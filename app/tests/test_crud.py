@@ -1,4 +1,7 @@
 import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg2
+from sqlalchemy.orm import Session
 from app import crud, schemas, models
 
 
@@ -211,3 +214,314 @@ def test_update_libro_duplicate_isbn(db, sample_autor_data, sample_libro_data):
     with pytest.raises(ValueError, match="ISBN.*ya existe"):
         crud.update_libro(db=db, libro_id=db_libro1.id, libro_update=libro_update)
 
+
+
+def test_get_libros_cursor_pagination(db, sample_autor_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    for i in range(5):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i,
+            "autor_id": db_autor.id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    pagina = crud.get_libros_page(db=db, limit=2)
+    primera = pagina.items
+    segunda = crud.get_libros(db=db, limit=2, cursor=pagina.next_cursor)
+    
+    assert [libro.id for libro in primera] == sorted(libro.id for libro in primera)
+    assert segunda[0].id > primera[-1].id
+    assert len(segunda) == 2
+
+
+def test_get_libros_invalid_cursor(db):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        crud.get_libros(db=db, cursor="no-es-un-cursor")
+
+
+def test_search_libros_ranked_by_relevance(db, sample_autor_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    libros_data = [
+        {"titulo": "Memoria de mis putas tristes", "isbn": "1234567890", "ano_publicacion": 2004, "autor_id": db_autor.id},
+        {"titulo": "Soledad", "isbn": "0987654321", "ano_publicacion": 1985, "autor_id": db_autor.id},
+        {"titulo": "Cien años de soledad, una larga historia familiar", "isbn": "1122334455", "ano_publicacion": 1967, "autor_id": db_autor.id},
+    ]
+    
+    for libro_data in libros_data:
+        libro = schemas.LibroCreate(**libro_data)
+        crud.create_libro(db=db, libro=libro)
+    
+    resultados = crud.search_libros(db=db, titulo="SOLEDAD")
+    assert [libro.titulo for libro in resultados] == [
+        "Soledad",
+        "Cien años de soledad, una larga historia familiar",
+    ]
+    assert crud.count_search_libros(db=db, titulo="soledad") == 2
+
+
+def test_search_libros_follows_updates(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    crud.update_libro(db=db, libro_id=db_libro.id, libro_update=schemas.LibroUpdate(titulo="Otro título"))
+    
+    assert crud.search_libros(db=db, titulo="soledad") == []
+    assert len(crud.search_libros(db=db, titulo="título")) == 1
+    
+    crud.delete_libro(db=db, libro_id=db_libro.id)
+    assert crud.search_libros(db=db, autor="García") == []
+
+
+def test_search_libros_short_term(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    
+    assert len(crud.search_libros(db=db, titulo="so")) == 1
+
+
+def test_search_libros_titulo_or_autor(db, sample_autor_data, sample_libro_data):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    otro = crud.create_autor(db=db, autor=schemas.AutorCreate(nombre="Ga Borges"))
+    sample_libro_data["autor_id"] = db_autor.id
+    crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    crud.create_libro(db=db, libro=schemas.LibroCreate(
+        titulo="Ficciones", isbn="9788420633121", ano_publicacion=1944, autor_id=otro.id
+    ))
+    crud.create_libro(db=db, libro=schemas.LibroCreate(
+        titulo="El Aleph", isbn="9788420633138", ano_publicacion=1949, autor_id=otro.id
+    ))
+    
+    # Términos cortos: sin FTS, por el mismo camino que PostgreSQL
+    titulos = {libro.titulo for libro in crud.search_libros(db=db, titulo="so", autor="Bo")}
+    assert titulos == {"Cien años de soledad", "Ficciones", "El Aleph"}
+    assert crud.count_search_libros(db=db, titulo="so", autor="Bo") == 3
+    assert crud.count_search_libros(db=db, titulo="Al", autor="xx") == 1
+
+
+def test_search_libros_postgresql_filters_one_table_per_branch():
+    pg = Session(bind=create_engine("postgresql://"))
+    stmt, _ = crud._build_search_query(pg, titulo="soledad", autor="Borges")
+    sql = str(stmt.compile(dialect=pg.get_bind().dialect))
+    
+    # Un OR entre libros.titulo y autores.nombre impediría usar los índices trigram
+    assert " OR " not in sql
+    assert "UNION" in sql
+
+
+def test_get_libros_page_single_query(db, sample_autor_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    for i in range(5):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i,
+            "autor_id": db_autor.id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    db.expire_all()
+    
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        pagina = crud.get_libros_page(db=db, skip=0, limit=2, ano=2001)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    assert len(statements) == 1
+    assert pagina.total == 1
+    assert len(pagina.items) == 1
+    
+    pagina = crud.get_libros_page(db=db, skip=2, limit=2)
+    assert pagina.total == 5
+    assert len(pagina.items) == 2
+    
+    pagina = crud.get_libros_page(db=db, skip=20, limit=2)
+    assert pagina.total == 5
+    assert pagina.items == []
+
+
+def test_count_libros_autor_list_and_range(db):
+    autores = [crud.create_autor(db=db, autor=schemas.AutorCreate(nombre=f"Autor {i}")) for i in range(3)]
+    for i in range(9):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i,
+            "autor_id": autores[i % 3].id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    assert crud.count_libros(db=db, autor_id=[autores[0].id, autores[1].id]) == 6
+    assert crud.count_libros(db=db, autor_id=[autores[2].id]) == 3
+    assert crud.count_libros(db=db, ano_desde=2003, ano_hasta=2005) == 3
+    assert crud.count_libros(db=db, autor_id=autores[0].id, ano_desde=2003) == 2
+    
+    libros = crud.get_libros(db=db, limit=3, sort=schemas.LibroSort.ano_publicacion_desc)
+    assert [libro.ano_publicacion for libro in libros] == [2008, 2007, 2006]
+
+
+@pytest.mark.parametrize("dialect", [psycopg2.dialect(), asyncpg.dialect()], ids=["psycopg2", "asyncpg"])
+def test_explain_sql_expands_autor_list(dialect):
+    stmt = crud._libros_statement(autor_id=[1, 2], ano_desde=2000).with_only_columns(models.Libro.id)
+    sql, params = crud._explain_sql(stmt, dialect)
+
+    assert "POSTCOMPILE" not in sql
+    valores = list(params.values()) if isinstance(params, dict) else list(params)
+    assert sorted(valores) == [1, 2, 2000]
+
+
+def test_create_libro_insert_returning(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    sample_libro_data["autor_id"] = db_autor.id
+    
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    # INSERT ... RETURNING y la lectura del autor (que luego sirve la caché)
+    assert len(statements) <= 2
+    assert "RETURNING" in statements[0]
+    assert db_libro.id is not None
+    assert db_libro.version == 1
+    assert db_libro.autor.nombre == sample_autor_data["nombre"]
+    
+    with pytest.raises(ValueError, match="ISBN.*ya existe"):
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    assert crud.count_libros(db=db) == 1
+
+
+def test_bulk_create_libros(db, sample_autor_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    crud.create_libro(db=db, libro=schemas.LibroCreate(
+        titulo="Existente", isbn="1111111111", ano_publicacion=2000, autor_id=db_autor.id
+    ))
+    
+    libros = [
+        (0, schemas.LibroCreate(titulo="Libro 0", isbn="1234567890", ano_publicacion=2000, autor_id=db_autor.id)),
+        (1, schemas.LibroCreate(titulo="Libro 1", isbn="1111111111", ano_publicacion=2000, autor_id=db_autor.id)),
+        (2, schemas.LibroCreate(titulo="Libro 2", isbn="0987654321", ano_publicacion=2000, autor_id=999)),
+        (3, schemas.LibroCreate(titulo="Libro 3", isbn="1234567890", ano_publicacion=2000, autor_id=db_autor.id)),
+        (4, schemas.LibroCreate(titulo="Libro 4", isbn="1122334455", ano_publicacion=2001, autor_id=db_autor.id)),
+    ]
+    result = crud.bulk_create_libros(db=db, libros=libros)
+    
+    assert result.inserted == 2
+    assert [index for index, _ in result.errors] == [1, 2, 3]
+    assert crud.count_libros(db=db) == 3
+    assert len(crud.search_libros(db=db, titulo="Libro 4")) == 1
+
+
+def test_update_libro_increments_version(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    assert crud.get_libro_version(db=db, libro_id=db_libro.id) == 1
+    
+    crud.update_libro(db=db, libro_id=db_libro.id, libro_update=schemas.LibroUpdate(titulo="Otro"), expected_version=1)
+    assert crud.get_libro_version(db=db, libro_id=db_libro.id) == 2
+    
+    with pytest.raises(ValueError, match="versión.*no coincide"):
+        crud.update_libro(db=db, libro_id=db_libro.id, libro_update=schemas.LibroUpdate(titulo="Viejo"), expected_version=1)
+    
+    with pytest.raises(ValueError, match="versión.*no coincide"):
+        crud.delete_libro(db=db, libro_id=db_libro.id, expected_version=1)
+    
+    # Varias versiones aceptables (If-Match con varias etiquetas)
+    with pytest.raises(ValueError, match="versión.*no coincide"):
+        crud.delete_libro(db=db, libro_id=db_libro.id, expected_version=[1, 3])
+    crud.update_libro(db=db, libro_id=db_libro.id, libro_update=schemas.LibroUpdate(titulo="Otro más"), expected_version=[1, 2])
+    assert crud.delete_libro(db=db, libro_id=db_libro.id, expected_version=3) is True
+
+
+def test_update_delete_libro_single_statement(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    libro_id = db_libro.id
+    # Como la AsyncSession de la API: lo devuelto por RETURNING no se recarga tras el COMMIT
+    db.expire_on_commit = False
+    
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        updated = crud.update_libro(
+            db=db, libro_id=libro_id, libro_update=schemas.LibroUpdate(isbn="978-0-306-40615-7"), expected_version=1
+        )
+        deleted = crud.delete_libro(db=db, libro_id=libro_id, expected_version=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    # El autor lo sirve la caché: un UPDATE ... RETURNING y un DELETE ... RETURNING
+    assert [statement.split()[0] for statement in statements] == ["UPDATE", "DELETE"]
+    assert updated.isbn == "9780306406157"
+    assert updated.version == 2
+    assert deleted is True
+    
+    assert crud.get_libro_by_isbn(db=db, isbn=sample_libro_data["isbn"]) is None
+    assert crud.update_libro(db=db, libro_id=libro_id, libro_update=schemas.LibroUpdate(titulo="X")) is None
+    assert crud.delete_libro(db=db, libro_id=libro_id, expected_version=2) is False
+
+
+def test_get_libros_page_fields_skip_autor_join(db, sample_autor_data, sample_libro_data):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        pagina = crud.get_libros_page(db=db, fields=["id", "isbn"])
+        libro = crud.get_libro_fields(db=db, libro_id=pagina.items[0].id, fields=["titulo"])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    
+    assert all("autores" not in statement for statement in statements)
+    assert pagina.items[0].isbn == sample_libro_data["isbn"]
+    assert libro.titulo == sample_libro_data["titulo"]
+    
+    with pytest.raises(ValueError, match="Campo desconocido"):
+        crud.get_libros_page(db=db, fields=["precio"])
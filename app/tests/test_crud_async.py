@@ -0,0 +1,40 @@
+import pytest
+from app import crud_async, schemas
+
+
+@pytest.mark.asyncio
+async def test_create_and_get_libro(async_db, sample_autor_data, sample_libro_data):
+    db_autor = await crud_async.create_autor(db=async_db, autor=schemas.AutorCreate(**sample_autor_data))
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = await crud_async.create_libro(db=async_db, libro=schemas.LibroCreate(**sample_libro_data))
+    
+    retrieved_libro = await crud_async.get_libro(db=async_db, libro_id=db_libro.id)
+    assert retrieved_libro.titulo == sample_libro_data["titulo"]
+    assert retrieved_libro.autor.nombre == sample_autor_data["nombre"]
+
+
+@pytest.mark.asyncio
+async def test_create_libro_invalid_autor(async_db, sample_libro_data):
+    sample_libro_data["autor_id"] = 999
+    with pytest.raises(ValueError, match="Autor.*no existe"):
+        await crud_async.create_libro(db=async_db, libro=schemas.LibroCreate(**sample_libro_data))
+
+
+@pytest.mark.asyncio
+async def test_list_search_update_delete(async_db, sample_autor_data, sample_libro_data):
+    db_autor = await crud_async.create_autor(db=async_db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    db_libro = await crud_async.create_libro(db=async_db, libro=schemas.LibroCreate(**sample_libro_data))
+    
+    page = await crud_async.get_libros_page(db=async_db, limit=10)
+    assert page.total == 1
+    assert await crud_async.count_search_libros(db=async_db, titulo="soledad") == 1
+    
+    updated = await crud_async.update_libro(
+        db=async_db, libro_id=db_libro.id, libro_update=schemas.LibroUpdate(titulo="Nuevo título")
+    )
+    assert updated.titulo == "Nuevo título"
+    
+    assert await crud_async.delete_libro(db=async_db, libro_id=db_libro.id) is True
+    assert await crud_async.get_libro(db=async_db, libro_id=db_libro.id) is None
@@ -1,6 +1,15 @@
+import csv
+import io
+import json
 import pytest
+from datetime import datetime
 from fastapi import status
-from app import crud, schemas
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import update
+from app import crud, models, schemas
+from app.main import _iter_bulk_rows, _page_response
+from app.pagination import encode_cursor
 
 
 def test_health_check(client):
@@ -169,6 +178,32 @@ def test_delete_libro_not_found(client):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+def test_delete_autor_cascades_libros(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    otro = crud.create_autor(db=db, autor=schemas.AutorCreate(nombre="Otro"))
+    
+    for i, autor_id in enumerate([db_autor.id, db_autor.id, otro.id]):
+        client.post("/libros", json={
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000,
+            "autor_id": autor_id
+        })
+    
+    response = client.delete(f"/autores/{db_autor.id}")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"id": db_autor.id, "deleted_libros": 2}
+    
+    data = client.get("/libros").json()
+    assert data["total"] == 1
+    assert data["items"][0]["autor"]["id"] == otro.id
+    assert client.get("/libros/buscar", params={"titulo": "Libro"}).json()["total"] == 1
+    
+    response = client.delete(f"/autores/{db_autor.id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 def test_search_libros_by_titulo(client, sample_autor_data, db):
     autor = schemas.AutorCreate(**sample_autor_data)
     db_autor = crud.create_autor(db=db, autor=autor)
@@ -262,3 +297,445 @@ def test_list_libros_with_autor_id_filter(client, sample_autor_data, db):
     assert len(data["items"]) == 2
     assert data["total"] == 2
 
+
+
+def test_list_libros_cursor_pagination(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    for i in range(15):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i,
+            "autor_id": db_autor.id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    response = client.get("/libros?limit=10")
+    data = response.json()
+    assert len(data["items"]) == 10
+    assert data["next_cursor"] is not None
+    
+    response = client.get(f"/libros?limit=10&cursor={data['next_cursor']}")
+    assert response.status_code == status.HTTP_200_OK
+    siguiente = response.json()
+    assert len(siguiente["items"]) == 5
+    assert siguiente["next_cursor"] is None
+    
+    ids = [item["id"] for item in data["items"] + siguiente["items"]]
+    assert ids == sorted(set(ids))
+
+
+def test_list_libros_ranges_multi_autor_and_sort(client, db):
+    autores = [crud.create_autor(db=db, autor=schemas.AutorCreate(nombre=f"Autor {i}")) for i in range(3)]
+    for i in range(12):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i % 6,
+            "autor_id": autores[i % 3].id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    response = client.get(
+        f"/libros?autor_id={autores[0].id}&autor_id={autores[1].id}&ano_desde=2001&ano_hasta=2004"
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total"] == 6
+    assert all(item["autor_id"] in (autores[0].id, autores[1].id) for item in data["items"])
+    assert all(2001 <= item["ano_publicacion"] <= 2004 for item in data["items"])
+    
+    # Orden por año descendente recorrido con cursor: el cursor lleva (año, id)
+    vistos = []
+    url = "/libros?sort=-ano_publicacion&limit=5&count=none"
+    cursor = None
+    while True:
+        data = client.get(url + (f"&cursor={cursor}" if cursor else "")).json()
+        vistos += [(item["ano_publicacion"], item["id"]) for item in data["items"]]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert len(vistos) == 12
+    assert vistos == sorted(vistos, reverse=True)
+
+
+def test_list_libros_invalid_filters(client):
+    response = client.get("/libros?ano_desde=2010&ano_hasta=2000")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    response = client.get("/libros?sort=precio")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    
+    response = client.get("/libros?" + "&".join(f"autor_id={i}" for i in range(schemas.BATCH_MAX_KEYS + 1)))
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    # Un cursor de otro orden tiene otro número de valores
+    response = client.get("/libros?sort=ano_publicacion&cursor=WzFd")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_list_libros_invalid_cursor(client):
+    response = client.get("/libros?cursor=no-es-un-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize("valores", [["abc"], [{"x": 1}], [True], [None]])
+def test_list_libros_cursor_non_numeric(client, valores):
+    response = client.get(f"/libros?cursor={encode_cursor(valores)}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Cursor inválido"
+
+
+def test_list_libros_cursor_with_skip(client):
+    response = client.get("/libros?skip=10&cursor=WzFd")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_search_libros_cursor_pagination(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    for i in range(5):
+        libro_data = {
+            "titulo": f"Historia {'larga ' * i}de la soledad",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i,
+            "autor_id": db_autor.id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    completa = client.get("/libros/buscar?titulo=soledad&limit=5").json()
+    
+    ids = []
+    cursor = None
+    while True:
+        url = "/libros/buscar?titulo=soledad&limit=2"
+        if cursor:
+            url += f"&cursor={cursor}"
+        data = client.get(url).json()
+        ids.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    
+    assert ids == [item["id"] for item in completa["items"]]
+    assert completa["total"] == 5
+
+
+def test_list_libros_count_strategies(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    for i in range(3):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + i,
+            "autor_id": db_autor.id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    data = client.get("/libros?limit=2&count=none").json()
+    assert data["total"] is None
+    assert data["has_more"] is True
+    assert len(data["items"]) == 2
+    
+    data = client.get("/libros?limit=2&skip=2&count=none").json()
+    assert data["has_more"] is False
+    assert len(data["items"]) == 1
+    
+    data = client.get("/libros?limit=2&count=estimated").json()
+    assert data["total"] == 3
+    
+    data = client.get("/libros/buscar?titulo=Libro&count=none").json()
+    assert data["total"] is None
+    assert data["has_more"] is False
+
+
+def test_list_libros_invalid_count_strategy(client):
+    response = client.get("/libros?count=aproximado")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_bulk_create_libros_json(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    libros = [
+        {"titulo": "Libro 1", "isbn": "1234567890", "ano_publicacion": 2000, "autor_id": db_autor.id},
+        {"titulo": "", "isbn": "123", "ano_publicacion": 2000, "autor_id": db_autor.id},
+        {"titulo": "Libro 3", "isbn": "1234567890", "ano_publicacion": 2001, "autor_id": db_autor.id},
+    ]
+    response = client.post("/libros/bulk", json=libros)
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["inserted"] == 1
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    assert "ya existe" in data["errors"][1]["detail"]
+
+
+def test_bulk_create_libros_ndjson(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    lines = [
+        json.dumps({"titulo": f"Libro {i}", "isbn": f"9781234567{i:03d}", "ano_publicacion": 2000, "autor_id": db_autor.id})
+        for i in range(3)
+    ]
+    lines.insert(1, "{no es json")
+    response = client.post(
+        "/libros/bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["inserted"] == 3
+    assert data["errors"] == [{"index": 1, "detail": "JSON inválido"}]
+    assert client.get("/libros").json()["total"] == 3
+
+
+class _StreamRequest:
+    def __init__(self, body: bytes, chunk_size: int):
+        self.headers = {"content-type": "application/x-ndjson"}
+        self._chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    
+    async def stream(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_iter_bulk_rows_ndjson_chunks():
+    largo = json.dumps({"titulo": "x" * 100000})
+    body = f'{{"a": 1}}\n\n{largo}\n  \n{{"b": 2}}'.encode()
+    
+    for chunk_size in (1, 7, 4096, len(body)):
+        filas = [fila async for fila in _iter_bulk_rows(_StreamRequest(body, chunk_size))]
+        assert filas == [(0, b'{"a": 1}'), (1, largo.encode()), (2, b'{"b": 2}')]
+
+
+def test_bulk_create_libros_not_array(client):
+    response = client.post("/libros/bulk", json={"titulo": "Libro"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_libros_ndjson(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    for i in range(3):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000 + (i % 2),
+            "autor_id": db_autor.id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    response = client.get("/libros/export?ano=2000")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["titulo"] for line in lines] == ["Libro 0", "Libro 2"]
+    
+    libro = client.get(f"/libros/{lines[0]['id']}").json()
+    assert lines[0] == libro
+
+
+def test_export_libros_csv(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    libro_data = {"titulo": "Libro, con coma", "isbn": "1234567890", "ano_publicacion": 2000, "autor_id": db_autor.id}
+    crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+    
+    response = client.get(f"/libros/export?format=csv&autor_id={db_autor.id}")
+    assert response.status_code == status.HTTP_200_OK
+    
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert rows[0]["titulo"] == "Libro, con coma"
+    assert rows[0]["autor_nombre"] == sample_autor_data["nombre"]
+
+
+def test_get_libro_etag_not_modified(client, sample_autor_data, sample_libro_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    response = client.post("/libros", json=sample_libro_data)
+    etag = response.headers["etag"]
+    libro_id = response.json()["id"]
+    
+    response = client.get(f"/libros/{libro_id}")
+    assert response.headers["etag"] == etag
+    
+    response = client.get(f"/libros/{libro_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    
+    client.put(f"/libros/{libro_id}", json={"titulo": "Nuevo título"})
+    response = client.get(f"/libros/{libro_id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+
+def test_update_delete_libro_if_match(client, sample_autor_data, sample_libro_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    response = client.post("/libros", json=sample_libro_data)
+    etag = response.headers["etag"]
+    libro_id = response.json()["id"]
+    
+    response = client.put(f"/libros/{libro_id}", json={"titulo": "Uno"}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    nuevo_etag = response.headers["etag"]
+    
+    response = client.put(f"/libros/{libro_id}", json={"titulo": "Dos"}, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    
+    response = client.delete(f"/libros/{libro_id}", headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    
+    response = client.delete(f"/libros/{libro_id}", headers={"If-Match": nuevo_etag})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+def test_if_match_any_listed_version(client, sample_autor_data, sample_libro_data, db):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    libro_id = client.post("/libros", json=sample_libro_data).json()["id"]
+    client.put(f"/libros/{libro_id}", json={"titulo": "Uno"})
+    
+    # El libro está en la versión 2: basta con que una de las etiquetas coincida
+    headers = {"If-Match": f'"{libro_id}.1", "{libro_id}.2"'}
+    response = client.put(f"/libros/{libro_id}", json={"titulo": "Dos"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] == f'"{libro_id}.3"'
+    
+    response = client.delete(f"/libros/{libro_id}", headers={"If-Match": f'"{libro_id}.1", "{libro_id}.2"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = client.delete(f"/libros/{libro_id}", headers={"If-Match": f'"{libro_id}.2", "{libro_id}.3"'})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+def test_get_libro_fields_etag(client, sample_autor_data, sample_libro_data, db):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    sample_libro_data["autor_id"] = db_autor.id
+    response = client.post("/libros", json=sample_libro_data)
+    etag = response.headers["etag"]
+    libro_id = response.json()["id"]
+    
+    # La representación parcial no comparte ETag con la completa
+    response = client.get(f"/libros/{libro_id}?fields=titulo,id")
+    parcial = response.headers["etag"]
+    # Los campos van en el orden canónico de la respuesta, no en el de la petición
+    assert parcial == f'"{libro_id}.1.titulo+id"'
+    assert parcial != etag
+    
+    response = client.get(f"/libros/{libro_id}?fields=titulo,id", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    response = client.get(f"/libros/{libro_id}?fields=id,titulo", headers={"If-None-Match": parcial})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    response = client.get(f"/libros/{libro_id}", headers={"If-None-Match": parcial})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_sparse_fieldsets(client, sample_autor_data, sample_libro_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    libro_id = client.post("/libros", json=sample_libro_data).json()["id"]
+    
+    data = client.get("/libros", params={"fields": "isbn,id,titulo"}).json()
+    assert data["items"] == [{"titulo": sample_libro_data["titulo"], "isbn": sample_libro_data["isbn"], "id": libro_id}]
+    assert data["total"] == 1
+    
+    data = client.get("/libros/buscar", params={"titulo": "soledad", "fields": "id,autor"}).json()
+    assert list(data["items"][0]) == ["id", "autor"]
+    assert data["items"][0]["autor"]["nombre"] == sample_autor_data["nombre"]
+    
+    response = client.get(f"/libros/{libro_id}", params={"fields": "titulo"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"titulo": sample_libro_data["titulo"]}
+    assert response.headers["etag"] != client.get(f"/libros/{libro_id}").headers["etag"]
+    
+    assert client.get("/libros/999", params={"fields": "titulo"}).status_code == status.HTTP_404_NOT_FOUND
+    response = client.get("/libros", params={"fields": "id,precio"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "precio" in response.json()["detail"]
+
+
+def test_page_response_matches_pydantic_output(client, sample_autor_data, sample_libro_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    sample_libro_data["autor_id"] = db_autor.id
+    primero = crud.create_libro(db=db, libro=schemas.LibroCreate(**sample_libro_data))
+    crud.create_libro(db=db, libro=schemas.LibroCreate(
+        titulo="El otoño del patriarca \"Ñ\"", isbn="9780306406157", ano_publicacion=1975, autor_id=db_autor.id
+    ))
+    # Fecha sin microsegundos: isoformat() y orjson deben coincidir también ahí
+    db.execute(
+        update(models.Libro).where(models.Libro.id == primero.id).values(created_at=datetime(2024, 1, 2, 3, 4, 5))
+    )
+    db.commit()
+    
+    for skip in (0, 1):
+        page = crud.get_libros_page(db=db, skip=skip, limit=1)
+        libros = [crud.get_libro(db=db, libro_id=row.id) for row in page.items]
+        
+        esperado = JSONResponse(content=jsonable_encoder({
+            "items": [schemas.LibroResponse.model_validate(libro).model_dump() for libro in libros],
+            "total": page.total,
+            "skip": skip,
+            "limit": 1,
+            "has_more": page.has_more,
+            "next_cursor": page.next_cursor
+        })).body
+        assert _page_response(page, skip, 1).body == esperado
+    
+    assert client.get("/libros").headers["content-type"] == "application/json"
+
+
+def test_libros_batch(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    ids = []
+    for i in range(3):
+        response = client.post("/libros", json={
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000,
+            "autor_id": db_autor.id
+        })
+        ids.append(response.json()["id"])
+    
+    response = client.get("/libros/batch", params={"ids": f"{ids[2]},999,{ids[0]},{ids[2]}"})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [libro and libro["id"] for libro in data["items"]] == [ids[2], None, ids[0], ids[2]]
+    assert data["items"][0]["autor"]["nombre"] == sample_autor_data["nombre"]
+    assert data["not_found"] == [999]
+    
+    response = client.post(
+        "/libros/batch",
+        params={"fields": "id"},
+        json={"isbns": ["978-1-234-56700-1", "9780000000000"]}
+    )
+    assert response.json() == {"items": [{"id": ids[1]}, None], "not_found": ["9780000000000"]}
+    
+    assert client.get("/libros/batch", params={"ids": "1,x"}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get("/libros/batch").status_code == status.HTTP_400_BAD_REQUEST
+    response = client.post("/libros/batch", json={"ids": list(range(201))})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
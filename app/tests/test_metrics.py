@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from sqlalchemy import create_engine, text
+from app import crud, database, schemas
+from app.database import TimedQueuePool
+from app.metrics import QueryTimingMiddleware, RequestMetrics, render_pools
+
+
+def test_request_metrics_histogram():
+    metrics = RequestMetrics(buckets=(0.1, 1.0))
+    metrics.observe("GET", "/libros", 200, 0.05)
+    metrics.observe("GET", "/libros", 200, 0.5)
+    metrics.observe("GET", "/libros", 200, 3.0)
+    
+    lines = metrics.render()
+    labels = 'method="GET",route="/libros",status="200"'
+    assert f'http_requests_total{{{labels}}} 3' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="1.0"}} 2' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f'http_request_duration_seconds_sum{{{labels}}} 3.55' in lines
+    assert "http_requests_in_progress 0" in lines
+
+
+def test_render_pools_tracks_checkouts():
+    engine = create_engine("sqlite:///./test.db", poolclass=TimedQueuePool, pool_size=2)
+    with engine.connect():
+        lines = render_pools({"sync": engine.pool})
+    engine.dispose()
+    
+    assert 'db_pool_size{engine="sync"} 2' in lines
+    assert 'db_pool_checked_out{engine="sync"} 1' in lines
+    assert 'db_pool_checkouts_total{engine="sync"} 1' in lines
+    assert 'db_pool_overflow{engine="sync"} 0' in lines
+
+
+def test_pool_wait_excludes_connect_time():
+    def creator():
+        time.sleep(0.2)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    pool = TimedQueuePool(creator, pool_size=1, max_overflow=0, timeout=5)
+    # Abrir la primera conexión es lento, pero no es esperar a que se libere una
+    conexion = pool.connect()
+    assert pool.wait_seconds < 0.1
+
+    liberar = threading.Timer(0.2, conexion.close)
+    liberar.start()
+    pool.connect().close()
+    liberar.join()
+    assert pool.wait_seconds >= 0.15
+    assert pool.checkouts == 2
+    pool.dispose()
+
+
+def test_metrics_endpoint(client):
+    client.get("/libros/999")
+    client.get("/no-existe")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/libros/{libro_id}",status="404"}' in body
+    assert 'route="sin_ruta",status="404"' in body
+    assert "http_requests_in_progress 1" in body
+
+
+def test_server_timing_counts_queries(client, sample_autor_data, db):
+    autor = schemas.AutorCreate(**sample_autor_data)
+    db_autor = crud.create_autor(db=db, autor=autor)
+    
+    response = client.get("/libros", params={"autor_id": db_autor.id})
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert timing.endswith('desc="1 queries"')
+    
+    assert client.get("/health").headers["server-timing"].endswith('desc="0 queries"')
+
+
+def test_query_count_warning(db, caplog):
+    async def endpoint(scope, receive, send):
+        for _ in range(3):
+            db.execute(text("SELECT 1"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    
+    messages = []
+    
+    async def send(message):
+        messages.append(message)
+    
+    middleware = QueryTimingMiddleware(endpoint, warn_count=2)
+    scope = {"type": "http", "method": "GET", "path": "/libros"}
+    with caplog.at_level(logging.WARNING, logger="app.metrics"):
+        asyncio.run(middleware(scope, None, send))
+    
+    assert dict(messages[0]["headers"])[b"server-timing"].endswith(b'desc="3 queries"')
+    assert any("GET /libros ejecutó 3 consultas" in record.message for record in caplog.records)
+
+
+def test_slow_query_log(db, caplog, monkeypatch):
+    monkeypatch.setattr(database, "SQL_SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.sql"):
+        crud.count_libros(db=db, ano=1967)
+    
+    assert any(
+        "Consulta lenta" in record.message and "1967" in record.message for record in caplog.records
+    )
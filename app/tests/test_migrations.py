@@ -0,0 +1,83 @@
+import os
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app import database, models
+from app.database import Base, migration_heads, schema_revisions, stamp_schema, to_async_url
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")
+
+
+@pytest.fixture
+def migration_db(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migraciones.db'}"
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("sqlalchemy.url", url)
+    config.attributes["configure_logger"] = False
+    engine = create_engine(url)
+    yield config, engine
+    engine.dispose()
+
+
+def test_upgrade_matches_models(migration_db):
+    config, engine = migration_db
+    command.upgrade(config, "head")
+
+    with engine.connect() as conn:
+        assert schema_revisions(conn) == migration_heads()
+    indices = {index["name"] for index in inspect(engine).get_indexes("libros")}
+    assert {"ix_libros_autor_id_id", "ix_libros_ano_publicacion_id"} <= indices
+    # Lanza AutogenerateDiffsDetected si los modelos tienen cambios sin migración
+    command.check(config)
+
+
+def test_upgrade_from_create_all(migration_db):
+    config, engine = migration_db
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(models.Autor.__table__.insert(), {"nombre": "Jorge Luis Borges"})
+
+    # Una base creada antes de Alembic se marca en la revisión inicial y se actualiza sin errores
+    command.stamp(config, "0001_esquema_inicial")
+    command.upgrade(config, "head")
+    command.check(config)
+
+    with engine.connect() as conn:
+        assert schema_revisions(conn) == migration_heads()
+        assert conn.execute(text("SELECT nombre FROM autores")).scalar() == "Jorge Luis Borges"
+
+
+def test_downgrade_to_base(migration_db):
+    config, engine = migration_db
+    command.upgrade(config, "head")
+    command.downgrade(config, "base")
+
+    assert set(inspect(engine).get_table_names()) == {"alembic_version"}
+    with engine.connect() as conn:
+        assert schema_revisions(conn) == ()
+
+
+@pytest.mark.asyncio
+async def test_check_schema_version(migration_db, monkeypatch, caplog):
+    config, engine = migration_db
+    async_engine = create_async_engine(to_async_url(str(engine.url)), poolclass=NullPool)
+    monkeypatch.setattr(database, "async_engine", async_engine)
+
+    command.upgrade(config, "0004_version_libros")
+    assert await database.check_schema_version() is False
+    assert "alembic upgrade head" in caplog.text
+
+    with engine.begin() as conn:
+        stamp_schema(conn)
+    assert await database.check_schema_version() is True
+    await async_engine.dispose()
+
+
+def test_client_startup_checks_test_database(client, caplog):
+    # El arranque de TestClient revisa la base de test, ya marcada en la última revisión
+    avisos = [record for record in caplog.get_records("setup") if "alembic upgrade head" in record.getMessage()]
+    assert avisos == []
+    assert client.get("/health").status_code == 200
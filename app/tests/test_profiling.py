@@ -0,0 +1,60 @@
+import asyncio
+import os
+import pstats
+from app.profiling import ProfilingMiddleware
+
+
+async def _endpoint(scope, receive, send):
+    sum(i * i for i in range(200000))
+    await asyncio.sleep(0.01)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _call(middleware, path="/libros", headers=()):
+    messages = []
+    
+    async def send(message):
+        messages.append(message)
+    
+    scope = {"type": "http", "method": "GET", "path": path, "headers": list(headers)}
+    asyncio.run(middleware(scope, None, send))
+    return dict(messages[0]["headers"])
+
+
+def test_profiling_requires_token(tmp_path):
+    middleware = ProfilingMiddleware(_endpoint, token="secreto", sample_rate=0, output_dir=str(tmp_path))
+    
+    assert b"x-profile-file" not in _call(middleware)
+    assert b"x-profile-file" not in _call(middleware, headers=[(b"x-profile-token", b"otro")])
+    assert os.listdir(tmp_path) == []
+
+
+def test_profiling_writes_folded_stacks(tmp_path):
+    middleware = ProfilingMiddleware(
+        _endpoint, token="secreto", sample_rate=0, output_dir=str(tmp_path), paths=["/libros"]
+    )
+    
+    headers = _call(middleware, headers=[(b"x-profile-token", b"secreto")])
+    name = headers[b"x-profile-file"].decode()
+    assert name.endswith(".folded")
+    
+    with open(tmp_path / name) as f:
+        lines = f.read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "_endpoint" in "".join(lines)
+    
+    assert b"x-profile-file" not in _call(
+        middleware, path="/health", headers=[(b"x-profile-token", b"secreto")]
+    )
+
+
+def test_profiling_sampled_pstats(tmp_path):
+    middleware = ProfilingMiddleware(_endpoint, token=None, sample_rate=1.0, output_dir=str(tmp_path), formato="pstats")
+    
+    name = _call(middleware)[b"x-profile-file"].decode()
+    assert name.endswith(".prof")
+    stats = pstats.Stats(str(tmp_path / name))
+    assert any(func[2] == "_endpoint" for func in stats.stats)
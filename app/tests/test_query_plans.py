@@ -0,0 +1,146 @@
+import re
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app import crud, schemas
+from app.cache import cache
+from app.database import Base
+from app.pagination import encode_cursor
+from app.tests.conftest import TestingSessionLocal, engine
+from benchmarks.generate import generate_catalog
+
+# Suficientes filas para que, tras ANALYZE, el planificador elija igual que en producción
+PLAN_LIBROS = 20000
+PLAN_AUTORES = 1000
+
+PLAN_NODE = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)")
+
+# Cada forma de consulta declara los recorridos completos (SCAN tabla) u ordenaciones
+# (USE TEMP B-TREE) que son inherentes a ella; cualquier otro aparece como regresión.
+PLAN_SHAPES = [
+    # Contar toda la tabla exige recorrerla (basta un índice cubriente)
+    pytest.param(lambda db: crud.count_libros(db), {"SCAN libros"}, id="count_libros"),
+    pytest.param(lambda db: crud.count_libros(db, autor_id=5), set(), id="count_libros_autor"),
+    pytest.param(lambda db: crud.count_libros(db, ano=2020), set(), id="count_libros_ano"),
+    pytest.param(lambda db: crud.count_libros(db, autor_id=5, ano=2020), set(), id="count_libros_autor_ano"),
+    # Sin filtros la página recorre libros en orden de id y se detiene en el LIMIT
+    pytest.param(lambda db: crud.get_libros(db), {"SCAN libros"}, id="get_libros"),
+    pytest.param(lambda db: crud.get_libros(db, autor_id=5), set(), id="get_libros_autor"),
+    pytest.param(lambda db: crud.get_libros(db, ano=2020), set(), id="get_libros_ano"),
+    pytest.param(lambda db: crud.get_libros(db, autor_id=5, ano=2020), set(), id="get_libros_autor_ano"),
+    pytest.param(
+        lambda db: crud.get_libros(db, autor_id=5, cursor=encode_cursor([1000])), set(),
+        id="get_libros_autor_cursor"
+    ),
+    pytest.param(
+        lambda db: crud.count_libros(db, ano_desde=2000, ano_hasta=2010), set(), id="count_libros_rango"
+    ),
+    pytest.param(
+        lambda db: crud.get_libros(db, autor_id=5, sort=schemas.LibroSort.id_desc), set(),
+        id="get_libros_autor_id_desc"
+    ),
+    pytest.param(
+        lambda db: crud.get_libros(db, ano_desde=2000, ano_hasta=2010, sort=schemas.LibroSort.ano_publicacion),
+        set(), id="get_libros_rango_ano"
+    ),
+    pytest.param(
+        lambda db: crud.get_libros(db, autor_id=5, ano_desde=2000, sort=schemas.LibroSort.ano_publicacion_desc),
+        set(), id="get_libros_autor_rango_ano"
+    ),
+    pytest.param(
+        lambda db: crud.get_libros(
+            db, autor_id=5, sort=schemas.LibroSort.ano_publicacion, cursor=encode_cursor([2000, 100])
+        ),
+        set(), id="get_libros_autor_ano_cursor"
+    ),
+    pytest.param(
+        lambda db: crud.get_libros(db, sort=schemas.LibroSort.ano_publicacion_desc), {"SCAN libros"},
+        id="get_libros_ano_desc"
+    ),
+    # Varios autores o un rango de años ordenados por id juntan varios tramos del índice
+    pytest.param(
+        lambda db: crud.get_libros(db, autor_id=[3, 5, 8]), {"USE TEMP B-TREE"}, id="get_libros_autores"
+    ),
+    pytest.param(
+        lambda db: crud.get_libros(db, ano_desde=2000, ano_hasta=2010), {"USE TEMP B-TREE"},
+        id="get_libros_rango_id"
+    ),
+    pytest.param(lambda db: crud.get_libro_by_isbn(db, "9780000000123"), set(), id="get_libro_by_isbn"),
+    # La relevancia se calcula por coincidencia: ordenar los resultados de FTS es inevitable
+    pytest.param(
+        lambda db: crud.search_libros(db, titulo="soledad"), {"USE TEMP B-TREE"}, id="search_titulo"
+    ),
+    pytest.param(
+        lambda db: crud.search_libros(db, autor="Borges"), {"USE TEMP B-TREE"}, id="search_autor"
+    ),
+    pytest.param(
+        lambda db: crud.search_libros(db, titulo="soledad", autor="Borges"), {"USE TEMP B-TREE"},
+        id="search_titulo_autor"
+    ),
+    pytest.param(lambda db: crud.count_search_libros(db, titulo="soledad"), set(), id="count_search"),
+]
+
+
+@contextmanager
+def _capture_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def _plan_problems(plan, allowed):
+    problems = []
+    for detail in plan:
+        if detail.startswith("USE TEMP B-TREE"):
+            if "USE TEMP B-TREE" not in allowed:
+                problems.append(detail)
+            continue
+        node = PLAN_NODE.match(detail)
+        # Las tablas virtuales (FTS5) usan su propio índice: no es un recorrido secuencial
+        if node and node.group(1) == "SCAN" and "VIRTUAL TABLE" not in detail:
+            if f"SCAN {node.group(2)}" not in allowed:
+                problems.append(detail)
+    return problems
+
+
+@pytest.fixture(scope="module")
+def catalogo():
+    generate_catalog(engine, libros=PLAN_LIBROS, autores=PLAN_AUTORES, seed=1)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.mark.parametrize("query, allowed", PLAN_SHAPES)
+def test_query_plan_uses_indexes(catalogo, query, allowed):
+    cache.clear()
+    db = TestingSessionLocal()
+    try:
+        with _capture_statements() as statements:
+            query(db)
+        assert statements
+
+        connection = db.connection()
+        for statement, parameters in statements:
+            plan = [
+                row[3] for row in
+                connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            ]
+            problems = _plan_problems(plan, allowed)
+            assert not problems, f"{statement}\n" + "\n".join(plan)
+    finally:
+        db.close()
+
+
+def test_plan_problems():
+    assert _plan_problems(["SEARCH libros USING INDEX ix_libros_isbn (isbn=?)"], set()) == []
+    assert _plan_problems(["SCAN libros"], set()) == ["SCAN libros"]
+    assert _plan_problems(["SCAN TABLE libros"], {"SCAN libros"}) == []
+    assert _plan_problems(["USE TEMP B-TREE FOR ORDER BY"], set()) == ["USE TEMP B-TREE FOR ORDER BY"]
+    assert _plan_problems(["SCAN libros_fts VIRTUAL TABLE INDEX 0:M2"], set()) == []
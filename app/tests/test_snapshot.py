@@ -0,0 +1,81 @@
+import pytest
+import pyarrow.ipc
+import pyarrow.parquet
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import crud, models, schemas
+from app.snapshot import read_watermark, save_watermark, write_snapshot
+
+
+def _crear_libros(db, autor_id, inicio, cantidad):
+    for i in range(inicio, inicio + cantidad):
+        libro_data = {
+            "titulo": f"Libro {i}",
+            "isbn": f"9781234567{i:03d}",
+            "ano_publicacion": 2000,
+            "autor_id": autor_id
+        }
+        crud.create_libro(db=db, libro=schemas.LibroCreate(**libro_data))
+
+
+def test_write_snapshot_parquet(db, sample_autor_data, tmp_path):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    _crear_libros(db, db_autor.id, 0, 3)
+    
+    output = tmp_path / "libros.parquet"
+    result = write_snapshot(db, str(output), "parquet", safety_lag=timedelta(0))
+    
+    tabla = pyarrow.parquet.read_table(output)
+    assert result.rows == 3
+    assert tabla.num_rows == 3
+    assert tabla.column("autor_nombre").to_pylist() == [sample_autor_data["nombre"]] * 3
+
+
+def test_write_snapshot_incremental(db, sample_autor_data, tmp_path):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    _crear_libros(db, db_autor.id, 0, 2)
+    
+    state = str(tmp_path / "estado.json")
+    primero = write_snapshot(db, str(tmp_path / "1.arrow"), "arrow", safety_lag=timedelta(0))
+    save_watermark(state, primero.watermark)
+    
+    _crear_libros(db, db_autor.id, 2, 1)
+    segundo = write_snapshot(
+        db, str(tmp_path / "2.arrow"), "arrow", read_watermark(state), safety_lag=timedelta(0)
+    )
+    
+    tabla = pyarrow.ipc.open_file(str(tmp_path / "2.arrow")).read_all()
+    assert segundo.rows == 1
+    assert tabla.column("titulo").to_pylist() == ["Libro 2"]
+
+
+def _fechar(db, isbn, created_at):
+    db.execute(update(models.Libro).where(models.Libro.isbn == isbn).values(created_at=created_at))
+    db.commit()
+
+
+def test_write_snapshot_late_commit(db, sample_autor_data, tmp_path):
+    db_autor = crud.create_autor(db=db, autor=schemas.AutorCreate(**sample_autor_data))
+    _crear_libros(db, db_autor.id, 0, 2)
+    ahora = datetime.utcnow()
+    _fechar(db, "9781234567000", ahora - timedelta(minutes=10))
+    _fechar(db, "9781234567001", ahora - timedelta(seconds=10))
+    
+    # El libro 1 está dentro del margen: se deja para el siguiente snapshot
+    primero = write_snapshot(db, str(tmp_path / "1.arrow"), "arrow", safety_lag=timedelta(minutes=1))
+    assert primero.rows == 1
+    assert primero.watermark < ahora - timedelta(seconds=10)
+    
+    # Fila con created_at anterior al libro 1 que confirma después del primer snapshot
+    _crear_libros(db, db_autor.id, 2, 1)
+    _fechar(db, "9781234567002", ahora - timedelta(seconds=30))
+    
+    segundo = write_snapshot(db, str(tmp_path / "2.arrow"), "arrow", primero.watermark, timedelta(0))
+    tabla = pyarrow.ipc.open_file(str(tmp_path / "2.arrow")).read_all()
+    assert sorted(tabla.column("titulo").to_pylist()) == ["Libro 1", "Libro 2"]
+    assert segundo.rows == 2
+
+
+def test_write_snapshot_invalid_format(db, tmp_path):
+    with pytest.raises(ValueError, match="no soportado"):
+        write_snapshot(db, str(tmp_path / "libros.csv"), "csv")
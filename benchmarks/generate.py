@@ -0,0 +1,193 @@
+import argparse
+import csv
+import io
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Iterator, List, Tuple
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Engine
+from app import models
+from app.database import Base, DATABASE_URL, sql_logger, stamp_schema
+
+NOMBRES = [
+    "Ana", "Carlos", "Lucía", "Jorge", "María", "Pablo", "Isabel", "Julio", "Elena", "Mario",
+    "Laura", "Gabriel", "Sofía", "Octavio", "Clara", "Rubén", "Teresa", "Hernán", "Rosa", "Andrés",
+]
+APELLIDOS = [
+    "García", "Márquez", "Allende", "Borges", "Cortázar", "Neruda", "Paz", "Fuentes", "Vargas", "Llosa",
+    "Mistral", "Rulfo", "Storni", "Benedetti", "Onetti", "Bolaño", "Sábato", "Arlt", "Quiroga", "Darío",
+]
+PALABRAS = [
+    "soledad", "amor", "tiempo", "ciudad", "noche", "memoria", "río", "casa", "guerra", "silencio",
+    "sombra", "viaje", "mar", "laberinto", "espejo", "jardín", "fuego", "camino", "sueño", "historia",
+    "otoño", "patriarca", "ciegos", "perros", "héroes", "tumbas", "muerte", "cólera", "hojarasca", "piedra",
+]
+
+# Filas por lote: INSERT executemany en SQLite, COPY en PostgreSQL
+CHUNK_SIZE = 10000
+
+# Año más reciente de publicación; fijo para que la misma semilla dé el mismo catálogo
+# cualquier año en que se ejecute
+REFERENCE_YEAR = 2024
+
+
+def author_weights(autores: int, zipf: float) -> List[float]:
+    # Distribución de Zipf: pocos autores muy prolíficos y una cola larga con uno o dos libros
+    return list(accumulate(1 / (rank ** zipf) for rank in range(1, autores + 1)))
+
+
+def generate_autores(rng: random.Random, autores: int, primer_id: int = 1) -> Iterator[dict]:
+    inicio = datetime(2020, 1, 1)
+    for i in range(primer_id - 1, primer_id - 1 + autores):
+        nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        yield {"id": i + 1, "nombre": nombre, "created_at": inicio + timedelta(minutes=i)}
+
+
+def generate_libros(
+    rng: random.Random,
+    libros: int,
+    autores: int,
+    zipf: float,
+    ano_referencia: int = REFERENCE_YEAR,
+    primer_id: int = 1,
+    primer_autor_id: int = 1
+) -> Iterator[dict]:
+    cum_weights = author_weights(autores, zipf)
+    autor_ids = list(range(primer_autor_id, primer_autor_id + autores))
+    # Se barajan para que el autor más prolífico no sea siempre el de menor id
+    rng.shuffle(autor_ids)
+    inicio = datetime(2021, 1, 1)
+
+    # El ISBN y created_at salen del id: siguen siendo únicos al añadir datos con --no-reset
+    for i in range(primer_id - 1, primer_id - 1 + libros):
+        titulo = " ".join(rng.choice(PALABRAS) for _ in range(rng.randint(1, 5))).capitalize()
+        yield {
+            "id": i + 1,
+            "titulo": titulo,
+            "isbn": f"978{i:010d}",
+            # Sesgado hacia años recientes
+            "ano_publicacion": ano_referencia - int((rng.paretovariate(1.2) - 1) * 10) % 500,
+            "autor_id": autor_ids[rng.choices(range(autores), cum_weights=cum_weights)[0]],
+            "created_at": inicio + timedelta(seconds=i * 7),
+            "version": 1,
+        }
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_rows(engine: Engine, table, rows: List[dict]):
+    buffer = io.StringIO()
+    columns = list(rows[0])
+    writer = csv.writer(buffer)
+    writer.writerows([row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _load(engine: Engine, table, rows: Iterator[dict]) -> int:
+    total = 0
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        if engine.dialect.name == "postgresql":
+            _copy_rows(engine, table, chunk)
+        else:
+            with engine.begin() as conn:
+                conn.execute(insert(table), chunk)
+        total += len(chunk)
+    return total
+
+
+def _reset_sequences(engine: Engine):
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in (models.Autor.__table__, models.Libro.__table__):
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+            ))
+
+
+def generate_catalog(
+    engine: Engine,
+    libros: int,
+    autores: int,
+    zipf: float = 1.0,
+    seed: int = 42,
+    reset: bool = True,
+    ano_referencia: int = REFERENCE_YEAR
+) -> Tuple[int, int]:
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # El esquema sale de los modelos, que equivalen a la última migración
+    with engine.begin() as conn:
+        stamp_schema(conn)
+        # Sin reset se continúa detrás de los ids existentes; los libros nuevos son de los autores nuevos
+        primer_autor_id = conn.scalar(select(func.coalesce(func.max(models.Autor.id), 0))) + 1
+        primer_libro_id = conn.scalar(select(func.coalesce(func.max(models.Libro.id), 0))) + 1
+
+    rng = random.Random(seed)
+    total_autores = _load(engine, models.Autor.__table__, generate_autores(rng, autores, primer_autor_id))
+    total_libros = _load(engine, models.Libro.__table__, generate_libros(
+        rng, libros, autores, zipf, ano_referencia, primer_libro_id, primer_autor_id
+    ))
+    _reset_sequences(engine)
+
+    # Estadísticas frescas para que el planificador vea el tamaño real de las tablas
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return total_autores, total_libros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Genera un catálogo sintético de autores y libros para los benchmarks"
+    )
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--libros", type=int, default=10000, help="Número de libros (10k a 10M)")
+    parser.add_argument("--autores", type=int, help="Número de autores (default: libros / 20)")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Exponente de la distribución de libros por autor")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--ano-referencia", type=int, default=REFERENCE_YEAR, help="Año de publicación más reciente"
+    )
+    parser.add_argument("--no-reset", dest="reset", action="store_false", help="No borra las tablas existentes: añade datos detrás de los ids actuales")
+    args = parser.parse_args(argv)
+
+    autores = args.autores or max(1, args.libros // 20)
+    # Los lotes de la carga superan el umbral de consulta lenta: no tiene sentido registrarlos
+    sql_logger.setLevel(logging.ERROR)
+    engine = create_engine(args.database_url)
+    inicio = time.perf_counter()
+    total_autores, total_libros = generate_catalog(
+        engine, args.libros, autores, args.zipf, args.seed, args.reset, args.ano_referencia
+    )
+    engine.dispose()
+    print(
+        f"{total_autores} autores y {total_libros} libros cargados en "
+        f"{time.perf_counter() - inicio:.1f} s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+import httpx
+from benchmarks.generate import APELLIDOS, PALABRAS, REFERENCE_YEAR
+
+# Páginas de 100 libros leídas al inicio para obtener ids, ISBNs, autores y cursores reales
+SAMPLE_PAGES = 10
+BATCH_SIZE = 20
+BULK_SIZE = 100
+
+
+class Scenario(NamedTuple):
+    name: str
+    build: Callable
+    expected: Sequence[int] = (200,)
+    after: Optional[Callable] = None
+    # Los escenarios destructivos sobre el catálogo generado solo corren si se piden
+    default: bool = True
+
+
+class Catalog:
+    def __init__(self, rng: random.Random, ano_referencia: int = REFERENCE_YEAR):
+        self.rng = rng
+        self.ano_referencia = ano_referencia
+        self.ids: List[int] = []
+        self.isbns: List[str] = []
+        self.autor_ids: List[int] = []
+        self.cursors: List[str] = []
+        # Libros creados por el propio benchmark: son los únicos que se modifican o borran
+        self.created: List[int] = []
+        self._isbn_base = rng.randrange(9 * 10 ** 9)
+        self._isbn_count = 0
+
+    def next_isbn(self) -> str:
+        self._isbn_count += 1
+        return f"979{(self._isbn_base + self._isbn_count) % 10 ** 10:010d}"
+
+    def new_libro(self) -> dict:
+        return {
+            "titulo": " ".join(self.rng.sample(PALABRAS, 3)).capitalize(),
+            "isbn": self.next_isbn(),
+            "ano_publicacion": self.rng.randint(1900, self.ano_referencia),
+            "autor_id": self.rng.choice(self.autor_ids),
+        }
+
+
+async def load_catalog(client: httpx.AsyncClient, catalog: Catalog):
+    params = {"limit": 100, "count": "none", "fields": "id,isbn,autor_id"}
+    for _ in range(SAMPLE_PAGES):
+        response = await client.get("/libros", params=params)
+        response.raise_for_status()
+        page = response.json()
+        for libro in page["items"]:
+            catalog.ids.append(libro["id"])
+            catalog.isbns.append(libro["isbn"])
+            catalog.autor_ids.append(libro["autor_id"])
+        if not page["next_cursor"]:
+            break
+        catalog.cursors.append(page["next_cursor"])
+        params["cursor"] = page["next_cursor"]
+    if not catalog.ids:
+        raise SystemExit("El catálogo está vacío: ejecuta antes python -m benchmarks.generate")
+    catalog.autor_ids = sorted(set(catalog.autor_ids))
+
+
+async def _created_id(client: httpx.AsyncClient, catalog: Catalog) -> int:
+    # Preparación fuera de la medición cuando aún no hay libros propios
+    if catalog.created:
+        return catalog.created.pop()
+    response = await client.post("/libros", json=catalog.new_libro())
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def _remember_created(catalog: Catalog, response: httpx.Response):
+    if response.status_code == 201:
+        catalog.created.append(response.json()["id"])
+
+
+def _remember_updated(catalog: Catalog, response: httpx.Response):
+    if response.status_code == 200:
+        catalog.created.append(response.json()["id"])
+
+
+async def _list(client, catalog):
+    return "GET", "/libros", {"params": {"skip": catalog.rng.randrange(0, 500, 20), "limit": 20}}
+
+
+async def _list_autor(client, catalog):
+    return "GET", "/libros", {"params": {"autor_id": catalog.rng.choice(catalog.autor_ids), "limit": 20}}
+
+
+async def _list_cursor(client, catalog):
+    params = {"limit": 20, "count": "none"}
+    if catalog.cursors:
+        params["cursor"] = catalog.rng.choice(catalog.cursors)
+    return "GET", "/libros", {"params": params}
+
+
+async def _list_fields(client, catalog):
+    return "GET", "/libros", {"params": {"limit": 100, "count": "estimated", "fields": "id,titulo,isbn"}}
+
+
+async def _list_rango(client, catalog):
+    ano_desde = catalog.rng.randint(1950, 2010)
+    params = {
+        "autor_id": catalog.rng.sample(catalog.autor_ids, min(3, len(catalog.autor_ids))),
+        "ano_desde": ano_desde,
+        "ano_hasta": ano_desde + 10,
+        "sort": "-ano_publicacion",
+        "limit": 20,
+    }
+    return "GET", "/libros", {"params": params}
+
+
+async def _search_titulo(client, catalog):
+    return "GET", "/libros/buscar", {"params": {"titulo": catalog.rng.choice(PALABRAS), "limit": 20}}
+
+
+async def _search_autor(client, catalog):
+    return "GET", "/libros/buscar", {"params": {"autor": catalog.rng.choice(APELLIDOS), "limit": 20}}
+
+
+async def _get_libro(client, catalog):
+    return "GET", f"/libros/{catalog.rng.choice(catalog.ids)}", {}
+
+
+async def _get_libro_etag(client, catalog):
+    # El catálogo generado tiene version=1: la mayoría de respuestas son 304
+    libro_id = catalog.rng.choice(catalog.ids)
+    return "GET", f"/libros/{libro_id}", {"headers": {"If-None-Match": f'"{libro_id}.1"'}}
+
+
+async def _batch_get(client, catalog):
+    ids = catalog.rng.sample(catalog.ids, min(BATCH_SIZE, len(catalog.ids)))
+    return "GET", "/libros/batch", {"params": {"ids": ",".join(map(str, ids))}}
+
+
+async def _batch_post(client, catalog):
+    isbns = catalog.rng.sample(catalog.isbns, min(BATCH_SIZE, len(catalog.isbns)))
+    return "POST", "/libros/batch", {"json": {"isbns": isbns}}
+
+
+async def _export(client, catalog):
+    return "GET", "/libros/export", {"params": {"autor_id": catalog.rng.choice(catalog.autor_ids)}}
+
+
+async def _create(client, catalog):
+    return "POST", "/libros", {"json": catalog.new_libro()}
+
+
+async def _bulk(client, catalog):
+    return "POST", "/libros/bulk", {"json": [catalog.new_libro() for _ in range(BULK_SIZE)]}
+
+
+async def _update(client, catalog):
+    libro_id = await _created_id(client, catalog)
+    return "PUT", f"/libros/{libro_id}", {"json": {"titulo": " ".join(catalog.rng.sample(PALABRAS, 2))}}
+
+
+async def _delete(client, catalog):
+    return "DELETE", f"/libros/{await _created_id(client, catalog)}", {}
+
+
+async def _delete_autor(client, catalog):
+    return "DELETE", f"/autores/{catalog.autor_ids.pop()}", {}
+
+
+async def _health(client, catalog):
+    return "GET", "/health", {}
+
+
+async def _metrics(client, catalog):
+    return "GET", "/metrics", {}
+
+
+async def _cache_stats(client, catalog):
+    return "GET", "/cache/stats", {}
+
+
+SCENARIOS = [
+    Scenario("health", _health),
+    Scenario("metrics", _metrics),
+    Scenario("cache_stats", _cache_stats),
+    Scenario("list_libros", _list),
+    Scenario("list_libros_autor", _list_autor),
+    Scenario("list_libros_cursor", _list_cursor),
+    Scenario("list_libros_fields", _list_fields),
+    Scenario("list_libros_rango", _list_rango),
+    Scenario("search_titulo", _search_titulo),
+    Scenario("search_autor", _search_autor),
+    Scenario("get_libro", _get_libro),
+    Scenario("get_libro_etag", _get_libro_etag, expected=(200, 304)),
+    Scenario("batch_get", _batch_get),
+    Scenario("batch_post", _batch_post),
+    Scenario("export", _export),
+    Scenario("create_libro", _create, expected=(201,), after=_remember_created),
+    Scenario("bulk_create", _bulk),
+    Scenario("update_libro", _update, after=_remember_updated),
+    Scenario("delete_libro", _delete, expected=(204,)),
+    Scenario("delete_autor", _delete_autor, expected=(200, 404), default=False),
+]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    # Método del rango más cercano
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], statuses: Counter, errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else 0.0,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else 0.0,
+        },
+        "status": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+    scenario: Scenario,
+    concurrency: int,
+    duration: float
+) -> dict:
+    latencies: List[float] = []
+    statuses = Counter()
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            try:
+                method, url, kwargs = await scenario.build(client, catalog)
+            except IndexError:
+                # Sin autores que borrar: el escenario termina antes
+                return
+            inicio = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - inicio)
+            statuses[response.status_code] += 1
+            if response.status_code not in scenario.expected:
+                errors += 1
+            elif scenario.after is not None:
+                scenario.after(catalog, response)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, errors, time.perf_counter() - inicio)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def select_scenarios(names: Optional[Sequence[str]]) -> List[Scenario]:
+    if not names:
+        return [scenario for scenario in SCENARIOS if scenario.default]
+    by_name = {scenario.name: scenario for scenario in SCENARIOS}
+    unknown = sorted(set(names) - set(by_name))
+    if unknown:
+        raise SystemExit(f"Escenarios desconocidos: {', '.join(unknown)}")
+    return [by_name[name] for name in names]
+
+
+async def run_benchmark(
+    client: httpx.AsyncClient,
+    scenarios: Sequence[Scenario],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int,
+    ano_referencia: int = REFERENCE_YEAR
+) -> Dict[str, dict]:
+    catalog = Catalog(random.Random(seed), ano_referencia)
+    await load_catalog(client, catalog)
+    results = {}
+    for scenario in scenarios:
+        if warmup:
+            await run_scenario(client, catalog, scenario, concurrency, warmup)
+        results[scenario.name] = await run_scenario(client, catalog, scenario, concurrency, duration)
+    return results
+
+
+async def _run(args) -> dict:
+    scenarios = select_scenarios(args.scenarios)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.asgi:
+        # Cliente y API en el mismo event loop: útil para comparar commits, no para cifras absolutas
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://asgi"
+        await app.router.startup()
+    else:
+        transport = None
+        base_url = args.base_url
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url, transport=transport, limits=limits, timeout=args.timeout
+        ) as client:
+            results = await run_benchmark(
+                client, scenarios, args.concurrency, args.duration, args.warmup, args.seed,
+                args.ano_referencia
+            )
+    finally:
+        if args.asgi:
+            await app.router.shutdown()
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "base_url": base_url,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "reference_year": args.ano_referencia,
+        "scenarios": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Genera carga concurrente sobre la API y reporta throughput y latencias"
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--asgi", action="store_true", help="Ejecuta la API en el mismo proceso, sin servidor")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por escenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Segundos descartados por escenario")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--ano-referencia",
+        type=int,
+        default=REFERENCE_YEAR,
+        help="Año de publicación más reciente de los libros creados"
+    )
+    parser.add_argument("--scenarios", nargs="+", help="Escenarios a ejecutar (default: todos los no destructivos)")
+    parser.add_argument("--output", help="Archivo JSON de salida (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(_run(args))
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()